@@ -0,0 +1,133 @@
+import hashlib
+import marshal
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from metrics import METRICS
+
+DEFAULT_ANALYSIS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "llm_test_generation",
+                                           "analysis.sqlite3")
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def content_key(kind, version, data):
+    """
+    Cache key of a file's analysis: the hash of its content (bytes or an mmap), the
+    analyzer kind and version, and the Python version (ast.parse accepts different
+    syntax per version).
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{kind}:{version}:py{sys.version_info[0]}.{sys.version_info[1]}:{digest}"
+
+
+class AnalysisCache:
+    """
+    Persistent per-file analysis results (CodeAnalyzer, DocReader) in SQLite,
+    keyed by content_key, with size-bounded LRU eviction like ResponseCache.
+
+    Results are stored with marshal (the Python version is part of every key), so
+    they must be plain dicts/lists/strings/numbers; decoding is several times
+    faster than JSON, which matters when a warm run loads thousands of files.
+    """
+
+    def __init__(self, path=DEFAULT_ANALYSIS_CACHE_PATH, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Shared by the stage threads of batch mode, guarded by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " key TEXT PRIMARY KEY,"
+            " result BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_lru ON analyses (last_access)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        Return {key: result} for the keys that are cached.
+        """
+        requested = list(keys)
+        keys = list(dict.fromkeys(requested))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[i:i + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT key, result FROM analyses WHERE key IN ({placeholders})",
+                                          chunk).fetchall()
+                for key, result in rows:
+                    try:
+                        found[key] = marshal.loads(result)
+                    except (TypeError, ValueError, EOFError):
+                        pass  # an older format or a damaged row; the file is analyzed again and replaced
+                self._conn.execute(f"UPDATE analyses SET last_access = ? WHERE key IN ({placeholders})",
+                                   [time.time()] + chunk)
+            self._conn.commit()
+            hits = sum(1 for key in requested if key in found)
+            self.hits += hits
+            self.misses += len(requested) - hits
+        METRICS.inc("analysis_cache_hits", hits)
+        METRICS.inc("analysis_cache_misses", len(requested) - hits)
+        return found
+
+    def put_many(self, items):
+        """
+        Store {key: result} in one transaction.
+        """
+        rows = []
+        for key, result in items.items():
+            encoded = marshal.dumps(result)
+            rows.append((key, encoded, len(encoded), time.time()))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO analyses (key, result, size, last_access) VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM analyses ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
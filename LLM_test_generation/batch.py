@@ -0,0 +1,136 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def read_repo_list(path):
+    """
+    Repository URLs or local paths, one per line; blank lines and # comments are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.split("#", 1)[0].strip() for line in f]
+    return [line for line in lines if line]
+
+
+class BatchRunner:
+    """
+    Pipelines jobs through a fixed sequence of stages connected by queues.
+
+    Every stage has its own worker thread(s), so while one repository is being
+    cloned and analyzed another one's prompts can already be at the LLM. A stage
+    is a (name, callable) pair; the callable takes the job and returns False when
+    the job has nothing left to do. Exceptions fail only that job.
+    """
+
+    def __init__(self, stages, stage_workers=None, finalize=None):
+        self.stages = stages
+        self.stage_workers = stage_workers or {}
+        self.finalize = finalize
+        self.records = []
+        self._start = None
+
+    def _run_stage(self, index, inbox, outbox, remaining, lock):
+        name, stage = self.stages[index]
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            record, job = item
+            stage_start = time.perf_counter()
+            try:
+                keep_going = stage(job) is not False
+            except Exception as e:
+                keep_going = False
+                record["status"] = "failed"
+                record["failed_stage"] = name
+                record["error"] = f"{type(e).__name__}: {e}"
+                logger.exception(f"Stage {name} failed for {record['job']}")
+            record["stages"][name] = {
+                "start": round(stage_start - self._start, 3),
+                "seconds": round(time.perf_counter() - stage_start, 3),
+            }
+
+            if keep_going and index + 1 < len(self.stages):
+                outbox.put((record, job))
+            else:
+                self._finish(record, job)
+
+        # The last worker of a stage closes the next one
+        with lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self._workers(index + 1)):
+                outbox.put(_DONE)
+
+    def _finish(self, record, job):
+        if self.finalize is not None:
+            try:
+                self.finalize(job)
+            except Exception as e:
+                logger.error(f"Cleanup of {record['job']} failed: {e}")
+        summary = getattr(job, "summary", None)
+        if summary is not None:
+            record.update({k: v for k, v in summary().items() if k not in record})
+        record["finished"] = round(time.perf_counter() - self._start, 3)
+
+    def _workers(self, index):
+        return max(1, self.stage_workers.get(self.stages[index][0], 1))
+
+    def run(self, jobs, names=None):
+        """
+        Push every job through all stages and return one record per job, in input order.
+        """
+        jobs = list(jobs)
+        names = names or [str(job) for job in jobs]
+        self._start = time.perf_counter()
+        queues = [queue.Queue() for _ in self.stages] + [queue.Queue()]
+        remaining = [self._workers(i) for i in range(len(self.stages))]
+        lock = threading.Lock()
+
+        self.records = []
+        for name, job in zip(names, jobs):
+            record = {"job": name, "status": "ok", "stages": {}}
+            self.records.append(record)
+            queues[0].put((record, job))
+        for _ in range(remaining[0]):
+            queues[0].put(_DONE)
+
+        threads = []
+        for i in range(len(self.stages)):
+            for _ in range(self._workers(i)):
+                thread = threading.Thread(target=self._run_stage, args=(i, queues[i], queues[i + 1], remaining, lock),
+                                          daemon=True)
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        self.wall_time = time.perf_counter() - self._start
+        return self.records
+
+    def report(self):
+        """
+        Consolidated report: per-job records plus total time spent in every stage.
+        The gap between the stage total and wall_time is what pipelining saved.
+        """
+        stage_totals = {name: 0.0 for name, _ in self.stages}
+        for record in self.records:
+            for name, timing in record["stages"].items():
+                stage_totals[name] += timing["seconds"]
+        return {
+            "wall_time": round(self.wall_time, 3),
+            "stage_totals": {name: round(seconds, 3) for name, seconds in stage_totals.items()},
+            "sequential_time": round(sum(stage_totals.values()), 3),
+            "jobs": self.records,
+        }
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from analysis_cache import AnalysisCache
+from code_analyzer import CodeAnalyzer
+from doc_reader import DocReader
+
+
+def _timed_pass(root_dir, cache, workers, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    analyzer = CodeAnalyzer(root_dir, workers=workers, cache=cache)
+    code_results = analyzer.analyze()
+    docs = DocReader(root_dir, workers=workers, cache=cache).read_docs()
+    elapsed = time.perf_counter() - start
+    result = {"seconds": round(elapsed, 3), "files": len(code_results), "docs": len(docs),
+              "parsed": analyzer.parse_count}
+    if memory:
+        # What stays resident with the results, not the parser's transient peak
+        result["retained_mb"] = round(tracemalloc.get_traced_memory()[0] / 1e6, 1)
+        tracemalloc.stop()
+    return result
+
+
+def run(root_dir, workers=1, memory=False):
+    """
+    Analyze root_dir without a cache, then cold and warm against a fresh cache.
+    """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AnalysisCache(os.path.join(cache_dir, "analysis.sqlite3"))
+        report = {
+            "uncached": _timed_pass(root_dir, None, workers, memory),
+            "cold": _timed_pass(root_dir, cache, workers, memory),
+            "warm": _timed_pass(root_dir, cache, workers, memory),
+        }
+        report["cache"] = cache.stats()
+        cache.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm analysis-cache timings of CodeAnalyzer and DocReader.")
+    parser.add_argument("root", help="Repository to analyze")
+    parser.add_argument("--workers", type=int, default=1, help="Parser processes, as in main.py --workers")
+    parser.add_argument("--memory", action="store_true", help="Also report memory retained by the results (slower)")
+    args = parser.parse_args()
+    print(json.dumps(run(args.root, args.workers, args.memory), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from coverage_analyzer import CoverageAnalyzer
+from coverage_map import CoverageMap
+
+ENGINES = ("subprocess", "in-process")
+
+
+def _write_suite(root_dir, tests, functions_per_module=20):
+    """
+    A synthetic repository: `tests` functions spread over modules, one test file each.
+    """
+    os.makedirs(os.path.join(root_dir, "tests"))
+    for start in range(0, tests, functions_per_module):
+        module = f"mod{start // functions_per_module}"
+        with open(os.path.join(root_dir, f"{module}.py"), "w", encoding="utf-8") as f:
+            for i in range(start, min(start + functions_per_module, tests)):
+                f.write(f"def f{i}(x):\n    if x > {i}:\n        return x - {i}\n    return {i} - x\n\n\n")
+        for i in range(start, min(start + functions_per_module, tests)):
+            with open(os.path.join(root_dir, "tests", f"test_f{i}.py"), "w", encoding="utf-8") as f:
+                f.write(f"from {module} import f{i}\n\n\ndef test_f{i}():\n    assert f{i}({i + 1}) == 1\n")
+
+
+def _change_function(root_dir):
+    # Shift every line of mod0 below f0, as a real edit would
+    path = os.path.join(root_dir, "mod0.py")
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source.replace("def f0(x):\n", "def f0(x):\n    x = int(x)\n", 1))
+
+
+def _measure(root_dir, engine):
+    # Map, report and data file per engine, so the engines measure the same suite independently
+    state_dir = os.path.join(root_dir, f".bench_{engine}")
+    os.makedirs(state_dir)
+    coverage_map = CoverageMap(os.path.join(state_dir, "coverage_map.json"), root_dir)
+    return coverage_map, CoverageAnalyzer(test_dir=os.path.join(root_dir, "tests"), source_dir=root_dir,
+                                          report_file=os.path.join(state_dir, "coverage.json"),
+                                          in_process=engine == "in-process", coverage_map=coverage_map)
+
+
+def run(tests, engines=ENGINES):
+    with tempfile.TemporaryDirectory() as root_dir:
+        _write_suite(root_dir, tests)
+        measured = {engine: _measure(root_dir, engine) for engine in engines}
+        results = {}
+        for engine, (coverage_map, analyzer) in measured.items():
+            start = time.perf_counter()
+            analyzer.run_coverage()
+            results[engine] = {"full_run_seconds": round(time.perf_counter() - start, 2)}
+            coverage_map.save()
+
+        _change_function(root_dir)
+        reports = {}
+        for engine, (coverage_map, analyzer) in measured.items():
+            start = time.perf_counter()
+            affected = coverage_map.tests_covering([(os.path.join(root_dir, "mod0.py"), "f0")])
+            analyzer.run_coverage(affected)
+            reports[engine] = {name: funcs for name, funcs in analyzer.parse_coverage().items()
+                               if name.startswith("mod")}
+            results[engine].update({
+                "affected_tests": len(affected),
+                "targeted_refresh_seconds": round(time.perf_counter() - start, 2),
+                "functions_reported": sum(len(funcs) for funcs in reports[engine].values()),
+                "map_bytes": os.path.getsize(coverage_map.path),
+            })
+        return {
+            "test_files": tests,
+            "engines": results,
+            "same_coverage": all(report == next(iter(reports.values())) for report in reports.values()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Full coverage run vs a refresh of the tests of one changed function, per coverage engine.")
+    parser.add_argument("--tests", type=int, nargs="+", default=[100, 1000], help="Suite sizes to measure")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES),
+                        help="Engines measured side by side on the same suite (in-process: --in-process-coverage)")
+    args = parser.parse_args()
+    # pytest reports on stdout, in both engines; keep it for the JSON result
+    stdout = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        results = [run(tests, args.engines) for tests in args.tests]
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout, 1)
+        os.close(stdout)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
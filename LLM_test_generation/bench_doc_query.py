@@ -0,0 +1,100 @@
+import argparse
+import json
+import random
+import time
+
+from doc_index import DocIndex, is_valid_section
+from prompt_generator import PromptGenerator
+
+
+def _synthetic_docs(functions, documents, sections_per_doc, words_per_section, seed=1):
+    """
+    Documents whose sections mention the function names at random; every tenth
+    section is titled after one of them.
+    """
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(2000)]
+    vocabulary = words + functions
+    docs = {}
+    for d in range(documents):
+        sections = {}
+        for s in range(sections_per_doc):
+            heading = rng.choice(functions) if s % 10 == 0 else f"Section {d} {s}"
+            sections[heading] = " ".join(rng.choice(vocabulary) for _ in range(words_per_section))
+        docs[f"doc{d}.md"] = {"sections": sections}
+    return docs
+
+
+def _scan_related_docs(doc_data, function_name):
+    """
+    The lookup before DocIndex: score every section and keep the best one when
+    it reaches a relevance of 15. Kept here as the reference the index is checked against.
+    """
+    target = function_name.lower()
+    best_match = None
+    best_score = 0
+    for doc_info in doc_data.values():
+        for heading, content in doc_info.get("sections", {}).items():
+            if not is_valid_section(heading):
+                continue
+            heading_lower = heading.lower()
+            content_lower = content.lower()
+            score = 0
+            if target == heading_lower:
+                score += 20
+            if target in content_lower:
+                score += 10
+            score += sum(1 for k in target.split("_") if k in heading_lower or k in content_lower)
+            if score > best_score:
+                best_score = score
+                best_match = (heading, content)
+    if best_match and best_score >= 15:
+        heading, content = best_match
+        return f"### {heading}\n{content[:1000]}"
+    return None
+
+
+def _heading(snippet):
+    return snippet.split("\n", 1)[0] if snippet else None
+
+
+def run(functions=300, documents=50, sections_per_doc=80, words_per_section=150):
+    names = [f"func_{i}_name" for i in range(functions)]
+    docs = _synthetic_docs(names, documents, sections_per_doc, words_per_section)
+
+    start = time.perf_counter()
+    scanned = [_scan_related_docs(docs, name) for name in names]
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = DocIndex(docs)
+    build = time.perf_counter() - start
+    generator = PromptGenerator(None)
+    start = time.perf_counter()
+    queried = [generator._find_related_docs(None, index, name) for name in names]
+    query = time.perf_counter() - start
+
+    return {
+        "functions": functions,
+        "sections": len(index),
+        "scan_seconds": round(scan, 3),
+        "index_build_seconds": round(build, 3),
+        "index_query_seconds": round(query, 3),
+        "with_docs_scan": sum(1 for snippet in scanned if snippet),
+        "with_docs_index": sum(1 for snippet in queried if snippet),
+        "same_section": sum(1 for a, b in zip(scanned, queried) if _heading(a) == _heading(b)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Related-docs lookup: linear section scan vs DocIndex queries.")
+    parser.add_argument("--functions", type=int, default=300, help="Function names to look up")
+    parser.add_argument("--documents", type=int, default=50, help="Synthetic documents")
+    parser.add_argument("--sections", type=int, default=80, help="Sections per document")
+    parser.add_argument("--words", type=int, default=150, help="Words per section")
+    args = parser.parse_args()
+    print(json.dumps(run(args.functions, args.documents, args.sections, args.words), indent=2))
+
+
+if __name__ == "__main__":
+    main()
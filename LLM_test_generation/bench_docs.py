@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from doc_reader import DocReader
+from file_walker import walk_files
+
+
+def _markdown_section(n):
+    return (f"## function_{n}\n\n" + "Returns the normalized path of its argument. " * 12 + "\n\n"
+            f"```python\n# not a heading: inside a fence\nfunction_{n}('a/b')\n```\n\n"
+            f"### Notes {n}\n\n" + "Raises ValueError on empty input. " * 8 + "\n\n")
+
+
+def _rst_section(n):
+    title = f"function_{n}"
+    return (f"{title}\n{'-' * len(title)}\n\n" + "Returns the normalized path of its argument. " * 12 + "\n\n"
+            f"Example::\n\n    function_{n}('a/b')\n\n"
+            f"Notes {n}\n~~~~~~~~~~~\n\n" + "Raises ValueError on empty input. " * 8 + "\n\n")
+
+
+def _write_docs(root_dir, megabytes, files=4):
+    """
+    `files` documents, Markdown and RST alternately, of about megabytes in total, made of
+    sections with prose, code examples (fences holding "#" lines, RST literal blocks) and subsections.
+    """
+    size = int(megabytes * 1e6 / files)
+    n = 0
+    for i in range(files):
+        rst = i % 2 == 1
+        path = os.path.join(root_dir, f"guide{i}.rst" if rst else f"guide{i}.md")
+        written = 0
+        with open(path, "w", encoding="utf-8") as f:
+            header = f"Guide {i}\n{'=' * 20}\n\n" if rst else f"# Guide {i}\n\n"
+            written += f.write(header)
+            while written < size:
+                written += f.write(_rst_section(n) if rst else _markdown_section(n))
+                n += 1
+
+
+def run(root_dir, workers=1, rounds=3):
+    total_bytes = sum(os.path.getsize(path) for path in walk_files(root_dir, ('.md', '.rst')))
+    best = None
+    for _ in range(rounds):
+        reader = DocReader(root_dir, workers=workers)
+        start = time.perf_counter()
+        docs = reader.read_docs()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "documents": len(docs),
+        "sections": sum(len(doc["sections"]) for doc in docs.values()),
+        "indexed_sections": len(reader.index),
+        "megabytes": round(total_bytes / 1e6, 3),
+        "seconds": round(best, 4),
+        "mb_per_sec": round(total_bytes / 1e6 / best, 2) if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of DocReader (section parsing and indexing).")
+    parser.add_argument("root", nargs="?", help="Directory with .md/.rst documentation")
+    parser.add_argument("--synthetic", type=float, metavar="MB",
+                        help="Measure generated Markdown/RST documents of about MB megabytes instead of root")
+    parser.add_argument("--files", type=int, default=4, help="Number of generated documents (with --synthetic)")
+    parser.add_argument("--workers", type=int, default=1, help="Parser processes, as in main.py --workers")
+    parser.add_argument("--rounds", type=int, default=3, help="Best of this many passes is reported")
+    args = parser.parse_args()
+    if args.synthetic is None:
+        if args.root is None:
+            parser.error("a documentation directory or --synthetic MB is required")
+        print(json.dumps(run(args.root, args.workers, args.rounds), indent=2))
+        return
+    with tempfile.TemporaryDirectory() as root_dir:
+        _write_docs(root_dir, args.synthetic, args.files)
+        print(json.dumps(run(root_dir, args.workers, args.rounds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from generation_engine import GenerationEngine
+from ollama_client import OllamaClient
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    A minimal Ollama /api/generate: waits server.latency seconds, then answers
+    with a code block echoing the prompt, as one JSON object or an NDJSON stream.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        text = f"```python\n# {payload['prompt']}\ndef test_echo():\n    assert True\n```"
+        tokens = text.split(" ")
+        final = {"done": True, "prompt_eval_count": len(payload["prompt"].split()), "eval_count": len(tokens),
+                 "prompt_eval_duration": 0, "eval_duration": int(self.server.latency * 1e9)}
+
+        if payload.get("stream"):
+            body = "".join(json.dumps({"response": token + " ", "done": False}) + "\n" for token in tokens)
+            body += json.dumps({"response": "", **final}) + "\n"
+        else:
+            body = json.dumps({"response": text, **final})
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if payload.get("stream") else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(latency):
+    """
+    Start the fake server on a free local port. Returns (server, base URL).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(prompts=8, latency=0.2, concurrency=(1, 4), stream=False):
+    server, base_url = serve(latency)
+    try:
+        results = []
+        for max_concurrency in concurrency:
+            client = OllamaClient(base_url=base_url, pool_size=max_concurrency, stream=stream)
+            engine = GenerationEngine(client, max_concurrency=max_concurrency)
+            texts = [f"prompt {i}" for i in range(prompts)]
+            start = time.perf_counter()
+            responses = engine.generate_all(texts)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "concurrency": max_concurrency,
+                "prompts": prompts,
+                "seconds": round(elapsed, 3),
+                "in_order": all(response and f"# {text}\n" in response for text, response in zip(texts, responses)),
+            })
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenerationEngine against a local fake Ollama /api/generate server.")
+    parser.add_argument("--prompts", type=int, default=8, help="Prompts per measurement")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the fake server takes per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="max_concurrency values")
+    parser.add_argument("--stream", action="store_true", help="Use streamed responses, as main.py --stream")
+    args = parser.parse_args()
+    print(json.dumps(run(args.prompts, args.latency, args.concurrency, args.stream), indent=2))
+
+
+if __name__ == "__main__":
+    main()
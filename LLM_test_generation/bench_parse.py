@@ -0,0 +1,80 @@
+import argparse
+import ast
+import json
+import os
+import tempfile
+import time
+
+from code_analyzer import CodeAnalyzer
+from prompt_generator import PromptGenerator
+
+
+def _write_repo(root_dir, modules, classes_per_module, methods_per_class, functions_per_module):
+    for m in range(modules):
+        with open(os.path.join(root_dir, f"mod{m}.py"), "w", encoding="utf-8") as f:
+            f.write("import os\n\n\n")
+            for c in range(classes_per_module):
+                f.write(f"class C{c}:\n    \"\"\"Class {c}.\"\"\"\n\n")
+                for i in range(methods_per_class):
+                    f.write(f"    def m{i}(self, x):\n        return os.path.join(str(x), '{i}')\n\n")
+                f.write("\n")
+            for i in range(functions_per_module):
+                f.write(f"def f{i}(x, y):\n    if x > y:\n        return x - y\n    return y - x\n\n\n")
+
+
+class _ParseCounter:
+    """
+    Counts every ast.parse call of the process while active, whoever makes it.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self._parse = ast.parse
+
+    def __enter__(self):
+        def counting_parse(*args, **kwargs):
+            self.calls += 1
+            return self._parse(*args, **kwargs)
+        ast.parse = counting_parse
+        return self
+
+    def __exit__(self, *exc):
+        ast.parse = self._parse
+
+
+def run(modules=50, classes_per_module=4, methods_per_class=5, functions_per_module=10):
+    with tempfile.TemporaryDirectory() as root_dir:
+        _write_repo(root_dir, modules, classes_per_module, methods_per_class, functions_per_module)
+        with _ParseCounter() as counter:
+            start = time.perf_counter()
+            analyzer = CodeAnalyzer(root_dir)
+            code_results = analyzer.analyze()
+            analyze_calls = counter.calls
+            prompts = PromptGenerator(analyzer.extract_function_code).generate_batch_prompts(code_results,
+                                                                                            max_files=None)
+            elapsed = time.perf_counter() - start
+    return {
+        "files": len(code_results),
+        "functions": sum(len(data.get("functions", [])) for data in code_results.values()),
+        "prompts": len(prompts),
+        "ast_parse_calls": counter.calls,
+        "ast_parse_calls_analyze": analyze_calls,
+        "ast_parse_calls_prompts": counter.calls - analyze_calls,
+        "parse_count": analyzer.parse_count,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ast.parse calls and time of code analysis plus prompt generation on a synthetic repository.")
+    parser.add_argument("--modules", type=int, default=50, help="Modules of the synthetic repository")
+    parser.add_argument("--classes", type=int, default=4, help="Classes per module")
+    parser.add_argument("--methods", type=int, default=5, help="Methods per class")
+    parser.add_argument("--functions", type=int, default=10, help="Module-level functions per module")
+    args = parser.parse_args()
+    print(json.dumps(run(args.modules, args.classes, args.methods, args.functions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
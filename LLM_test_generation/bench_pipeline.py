@@ -0,0 +1,85 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from clone_github_repo import CloneManager
+from main import RepoRun
+from metrics import METRICS
+
+
+def _write_repo(root_dir, modules, functions_per_module):
+    """
+    A synthetic git repository: `modules` modules with `functions_per_module` small functions each.
+    """
+    os.makedirs(root_dir)
+    for m in range(modules):
+        with open(os.path.join(root_dir, f"mod{m}.py"), "w", encoding="utf-8") as f:
+            for i in range(functions_per_module):
+                f.write(f"def f{m}_{i}(x, y):\n    \"\"\"Helper {i}.\"\"\"\n"
+                        f"    if x > y:\n        return x - y + {i}\n    return y - x\n\n\n")
+    with open(os.path.join(root_dir, "README.md"), "w", encoding="utf-8") as f:
+        f.write("# Synthetic\n\n## f0_0\n\nReturns the distance of x and y.\n")
+    subprocess.run(["git", "init", "-q", root_dir], check=True)
+    subprocess.run(["git", "-C", root_dir, "add", "."], check=True)
+    subprocess.run(["git", "-C", root_dir, "-c", "user.name=bench", "-c", "user.email=bench@localhost",
+                    "commit", "-q", "-m", "synthetic"], check=True)
+
+
+def run(modules=10, functions_per_module=10, concurrency=4, ttft=0.0, tokens_per_sec=None, stream=False):
+    METRICS.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_dir = os.path.join(tmp, "repo")
+        _write_repo(repo_dir, modules, functions_per_module)
+        backend_options = {"ttft": ttft, "tokens_per_sec": tokens_per_sec}
+        run = RepoRun(repo_dir, concurrency=concurrency, stream=stream, backend="fake",
+                      backend_options=backend_options, clone_manager=CloneManager(base_dir=os.path.join(tmp, "work")))
+        stages = {}
+        start = time.perf_counter()
+        for stage in (run.clone, run.analyze, run.generate, run.coverage):
+            stage_start = time.perf_counter()
+            stage()
+            stages[stage.__name__] = round(time.perf_counter() - stage_start, 3)
+        total = time.perf_counter() - start
+        run.cleanup()
+
+    return {
+        "functions": modules * functions_per_module,
+        "prompts": len(run.prompts),
+        "tests_written": len(run.written_tests),
+        "stage_seconds": stages,
+        "total_seconds": round(total, 3),
+        "prompts_per_sec": round(len(run.prompts) / total, 2) if total else None,
+        "tests_per_minute": round(len(run.written_tests) / total * 60, 1) if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end RepoRun throughput (clone, analyze, generate, coverage) with the fake LLM backend.")
+    parser.add_argument("--modules", type=int, default=10, help="Modules of the synthetic repository")
+    parser.add_argument("--functions", type=int, default=10, help="Functions per module")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent LLM requests, as in main.py")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Simulated time to first token in seconds")
+    parser.add_argument("--tokens-per-sec", type=float, help="Simulated decode speed (default: instant)")
+    parser.add_argument("--stream", action="store_true", help="Stream the responses, as main.py --stream")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    # The pipeline prints prompts and pytest output; keep stdout for the JSON result
+    stdout = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        result = run(args.modules, args.functions, args.concurrency, args.ttft, args.tokens_per_sec, args.stream)
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout, 1)
+        os.close(stdout)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import re
+import sqlite3
+import time
+
+from code_rewriter import extract_code_block, rewrite_test_code, split_test_functions
+from response_cache import DEFAULT_CACHE_PATH
+
+TEST_NAME_PATTERN = re.compile(r"def test_(\w+?)(?:_\w+)?\(")
+
+
+def load_corpus(path=None, cache_path=None):
+    """
+    Recorded LLM outputs as dicts with "response", "function", "file" and "test_type".
+
+    Either a JSONL file with those keys or the response cache database; cached
+    responses carry no function name, so it is taken from the first test name.
+    """
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    with sqlite3.connect(cache_path or DEFAULT_CACHE_PATH) as conn:
+        rows = conn.execute("SELECT response FROM responses").fetchall()
+    corpus = []
+    for (response,) in rows:
+        match = TEST_NAME_PATTERN.search(response or "")
+        if match:
+            corpus.append({"response": response, "function": match.group(1), "file": "module.py",
+                           "test_type": "fuzz" if "@given" in response else "unit"})
+    return corpus
+
+
+def postprocess(entry):
+    # Same steps as write_generated_tests: rewrite once, then split fuzz modules per test
+    code = rewrite_test_code(extract_code_block(entry["response"]), entry["function"], entry["file"])
+    return split_test_functions(code) if entry.get("test_type") == "fuzz" else [code]
+
+
+def run(corpus, rounds=3):
+    total_bytes = sum(len(entry["response"].encode("utf-8")) for entry in corpus)
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for entry in corpus:
+            postprocess(entry)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "responses": len(corpus),
+        "megabytes": round(total_bytes / 1e6, 3),
+        "seconds": round(best, 4),
+        "responses_per_sec": round(len(corpus) / best, 1) if best else None,
+        "mb_per_sec": round(total_bytes / 1e6 / best, 2) if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of test post-processing over recorded LLM outputs.")
+    parser.add_argument("--corpus", help="JSONL file with response/function/file/test_type per line")
+    parser.add_argument("--cache", help=f"Response cache database to read instead (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--rounds", type=int, default=3, help="Best of this many passes is reported")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.cache)
+    if not corpus:
+        print("No recorded responses found.")
+        return
+    print(json.dumps(run(corpus, args.rounds), indent=2))
+
+
+if __name__ == "__main__":
+    main()
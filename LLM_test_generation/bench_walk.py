@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from file_walker import walk_files
+
+
+def _write_tree(root_dir, files, files_per_dir=50, dirs_per_level=10):
+    """
+    A package tree of `files` modules, files_per_dir per directory, with a root
+    .gitignore, a nested one every tenth directory, an ignored build/ output and
+    a virtualenv the walk has to prune.
+    """
+    with open(os.path.join(root_dir, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("build/\n*.log\n!keep.log\n")
+    for name in ("build", os.path.join(".venv", "lib")):
+        os.makedirs(os.path.join(root_dir, name))
+        for i in range(files_per_dir):
+            open(os.path.join(root_dir, name, f"skipped{i}.py"), "w").close()
+    open(os.path.join(root_dir, ".venv", "pyvenv.cfg"), "w").close()
+
+    for d in range((files + files_per_dir - 1) // files_per_dir):
+        parts, n = [], d
+        while True:
+            parts.append(f"pkg{n % dirs_per_level}")
+            n //= dirs_per_level
+            if not n:
+                break
+        directory = os.path.join(root_dir, "src", *reversed(parts), f"d{d}")
+        os.makedirs(directory)
+        if d % 10 == 0:
+            with open(os.path.join(directory, ".gitignore"), "w", encoding="utf-8") as f:
+                f.write("generated_*.py\n")
+        for i in range(min(files_per_dir, files - d * files_per_dir)):
+            open(os.path.join(directory, f"m{i}.py"), "w").close()
+
+
+def run(files, rounds=3):
+    with tempfile.TemporaryDirectory() as root_dir:
+        _write_tree(root_dir, files)
+        best, found = None, 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            found = sum(1 for _ in walk_files(root_dir, (".py",)))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return {
+        "files": files,
+        "found": found,
+        "seconds": round(best, 4),
+        "microseconds_per_file": round(best / files * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of walk_files (gitignore matching and pruning) with tree size.")
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 10000, 50000], help="Tree sizes to measure")
+    parser.add_argument("--rounds", type=int, default=3, help="Best of this many walks is reported")
+    args = parser.parse_args()
+    print(json.dumps([run(files, args.rounds) for files in args.files], indent=2))
+
+
+if __name__ == "__main__":
+    main()
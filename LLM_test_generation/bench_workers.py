@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from code_analyzer import CodeAnalyzer
+from doc_reader import DocReader
+
+
+def _write_tree(root_dir, modules, functions_per_module, docs, sections_per_doc):
+    """
+    A synthetic repository: packages of modules with branching functions and
+    methods, and Markdown documents with one section per function.
+    """
+    for m in range(modules):
+        directory = os.path.join(root_dir, f"pkg{m % 20}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"mod{m}.py"), "w", encoding="utf-8") as f:
+            f.write("import os\nimport re\n\n\nclass Worker:\n")
+            for i in range(functions_per_module // 2):
+                f.write(f"    def step{i}(self, x):\n        if x > {i} and x % 2:\n"
+                        f"            return self.step{max(i - 1, 0)}(x - 1)\n        return [y for y in range(x)]\n\n")
+            f.write("\n")
+            for i in range(functions_per_module - functions_per_module // 2):
+                f.write(f"def f{m}_{i}(path, n):\n    for _ in range(n):\n        if re.match(r'a+', path):\n"
+                        f"            path = os.path.join(path, '{i}')\n    return path\n\n\n")
+    os.makedirs(os.path.join(root_dir, "docs"), exist_ok=True)
+    for d in range(docs):
+        with open(os.path.join(root_dir, "docs", f"guide{d}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Guide {d}\n\n")
+            for s in range(sections_per_doc):
+                f.write(f"## f{(d + s) % modules}_{s % functions_per_module}\n\n"
+                        + "Joins the path n times when it matches. " * 20
+                        + f"\n\n```python\nf{d}_{s}('aa', 2)\n```\n\n")
+
+
+def _best(measure, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = measure()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(workers=(1, 2, 4, 8), modules=400, functions_per_module=20, docs=200, sections_per_doc=30, rounds=3):
+    with tempfile.TemporaryDirectory() as root_dir:
+        _write_tree(root_dir, modules, functions_per_module, docs, sections_per_doc)
+        results = []
+        for count in workers:
+            # No analysis cache: every pass parses every file
+            code_seconds, code_results = _best(lambda: CodeAnalyzer(root_dir, workers=count).analyze(), rounds)
+            doc_seconds, docs_data = _best(lambda: DocReader(root_dir, workers=count).read_docs(), rounds)
+            results.append({
+                "workers": count,
+                "files": len(code_results),
+                "docs": len(docs_data),
+                "code_seconds": round(code_seconds, 3),
+                "docs_seconds": round(doc_seconds, 3),
+            })
+    base = results[0]
+    for result in results:
+        result["code_speedup"] = round(base["code_seconds"] / result["code_seconds"], 2)
+        result["docs_speedup"] = round(base["docs_seconds"] / result["docs_seconds"], 2)
+    return {"cpus": os.cpu_count(), "runs": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scaling of parallel parsing (CodeAnalyzer and DocReader, as main.py --workers) on a synthetic tree.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to measure")
+    parser.add_argument("--modules", type=int, default=400, help="Python modules of the synthetic tree")
+    parser.add_argument("--functions", type=int, default=20, help="Functions and methods per module")
+    parser.add_argument("--docs", type=int, default=200, help="Markdown documents of the synthetic tree")
+    parser.add_argument("--sections", type=int, default=30, help="Sections per document")
+    parser.add_argument("--rounds", type=int, default=3, help="Best of this many passes is reported")
+    args = parser.parse_args()
+    print(json.dumps(run(args.workers, args.modules, args.functions, args.docs, args.sections, args.rounds),
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
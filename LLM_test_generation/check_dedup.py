@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+
+from dedup import TestDeduplicator
+
+
+def _write_tests(test_dir, names):
+    paths = []
+    for name in names:
+        path = os.path.join(test_dir, f"{name}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"def {name}():\n    assert True\n")
+        paths.append(path)
+    return paths
+
+
+def check_no_source_lines():
+    """
+    Tests whose contexts hold no source lines (only their own file) must all be kept.
+    """
+    with tempfile.TemporaryDirectory() as root_dir:
+        test_dir = os.path.join(root_dir, "tests")
+        os.makedirs(test_dir)
+        tests = _write_tests(test_dir, ["test_a", "test_b", "test_c"])
+        test_lines = {test: {test: {1, 2}} for test in tests}
+        kept = TestDeduplicator(os.path.join(root_dir, "redundant")).prune(tests, test_lines, test_dir=test_dir)
+        assert kept == tests, kept
+        assert all(os.path.exists(test) for test in tests)
+    return {"kept": len(kept), "of": len(tests)}
+
+
+def check_module_level_only():
+    """
+    A test checking only module-level state (run at import) is kept next to
+    tests that cover functions; a real duplicate is still pruned.
+    """
+    with tempfile.TemporaryDirectory() as root_dir:
+        test_dir = os.path.join(root_dir, "tests")
+        os.makedirs(test_dir)
+        source = os.path.join(root_dir, "m.py")
+        open(source, "w").close()
+        covering, duplicate, module_state = _write_tests(test_dir, ["test_f", "test_f_again", "test_constant"])
+        test_lines = {covering: {source: {5, 6}}, duplicate: {source: {5}}, module_state: {}}
+        deduplicator = TestDeduplicator(os.path.join(root_dir, "redundant"))
+        kept = deduplicator.prune([covering, duplicate, module_state], test_lines, test_dir=test_dir)
+        assert kept == [covering, module_state], kept
+        assert deduplicator.pruned == 1
+    return {"kept": len(kept), "of": 3}
+
+
+def main():
+    print(json.dumps({"no_source_lines": check_no_source_lines(),
+                      "module_level_only": check_module_level_only()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,186 @@
+import hashlib
+import logging
 import os
 import shutil
-import tempfile
+import stat
 import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Everything the analysis, the doc index and pytest need; with sparse=True other blobs are never
+# downloaded, so tests reading data files (fixtures, JSON, CSV) of the repository will fail
+SPARSE_PATTERNS = ["*.py", "*.pyi", "*.md", "*.rst", "*.txt", "*.toml", "*.cfg", "*.ini", "*.gitignore"]
+
+
+def default_clone_dir():
+    """
+    LLM_TEST_GEN_CLONE_DIR if set, otherwise D:/temp_repos on Windows and the system temp dir elsewhere.
+    """
+    if os.environ.get("LLM_TEST_GEN_CLONE_DIR"):
+        return os.environ["LLM_TEST_GEN_CLONE_DIR"]
+    if os.name == "nt":
+        return "D:/temp_repos"
+    return os.path.join(tempfile.gettempdir(), "llm_test_generation", "repos")
+
+
+DEFAULT_MIRROR_DIR = os.path.join(os.path.expanduser("~"), ".cache", "llm_test_generation", "mirrors")
+
+
+def _remove_readonly(func, path, _):
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def _dir_size(path):
+    total = 0
+    for subdir, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(subdir, file)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _git(*args):
+    subprocess.run(["git", *args], check=True)
+
+
+def _is_local_git_path(repo_url):
+    return os.path.isdir(repo_url)
+
+
+# Batch runs clone on several threads; every fetch, worktree add or prune of one mirror is serialized
+_MIRROR_LOCKS = {}
+_MIRROR_LOCKS_GUARD = threading.Lock()
+
+
+def _mirror_lock(mirror):
+    with _MIRROR_LOCKS_GUARD:
+        return _MIRROR_LOCKS.setdefault(os.path.abspath(mirror), threading.Lock())
+
+
+class CloneManager:
+    """
+    Gets working copies of repositories as cheaply as possible.
+
+    Without a mirror cache every repository is cloned with --depth 1 and a
+    blob-less filter; with sparse only SPARSE_PATTERNS are checked out. With
+    mirror_dir a bare, blob-less mirror per repository is kept there and updated
+    with fetch; working copies are then worktrees of the mirror, so blobs fetched
+    once are reused by later runs. Time and bytes transferred of every clone are kept in stats,
+    keyed by working copy path.
+    """
+
+    def __init__(self, base_dir=None, mirror_dir=None, depth=1, filter_blobs=True, sparse=False):
+        self.base_dir = base_dir or default_clone_dir()
+        self.mirror_dir = mirror_dir
+        self.depth = depth
+        self.filter_blobs = filter_blobs
+        self.sparse = sparse
+        self.stats = {}
+        self._mirrors = {}  # working copy -> mirror it is a worktree of
+
+    @staticmethod
+    def _remote(repo_url):
+        # --depth and --filter are ignored for plain local paths, but honoured over file://
+        if _is_local_git_path(repo_url):
+            return "file://" + os.path.abspath(repo_url)
+        return repo_url
+
+    def _clone_args(self):
+        args = []
+        if self.depth:
+            args += ["--depth", str(self.depth)]
+        if self.filter_blobs:
+            args.append("--filter=blob:none")
+        return args
+
+    def _sparse_checkout(self, repo_path):
+        _git("-C", repo_path, "sparse-checkout", "set", "--no-cone", *SPARSE_PATTERNS)
+
+    def clone(self, repo_url):
+        """
+        Return the path of a fresh working copy of repo_url, or None if it could not be obtained.
+        """
+        os.makedirs(self.base_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.base_dir)
+        start = time.perf_counter()
+        # Plain local directories are copied; git repositories (local or remote) are cloned
+        if os.path.isdir(repo_url) and not os.path.exists(os.path.join(repo_url, ".git")):
+            shutil.copytree(repo_url, temp_dir, dirs_exist_ok=True)
+            self._record(temp_dir, repo_url, "copy", start, _dir_size(temp_dir))
+            logger.info(f"Repo copied to: {temp_dir}")
+            return temp_dir
+
+        try:
+            if self.mirror_dir:
+                self._checkout_from_mirror(repo_url, temp_dir, start)
+            else:
+                _git("clone", *self._clone_args(), *(["--sparse"] if self.sparse else []),
+                     self._remote(repo_url), temp_dir)
+                if self.sparse:
+                    self._sparse_checkout(temp_dir)
+                self._record(temp_dir, repo_url, "clone", start, _dir_size(os.path.join(temp_dir, ".git", "objects")))
+            logger.info(f"Repo cloned to: {temp_dir}")
+            return temp_dir
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error while cloning repo: {e}")
+            self.release(temp_dir)
+            return None
+
+    def _mirror_path(self, repo_url):
+        name = os.path.basename(repo_url.rstrip("/")).removesuffix(".git") or "repo"
+        digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.mirror_dir, f"{name}-{digest}.git")
+
+    def _checkout_from_mirror(self, repo_url, temp_dir, start):
+        mirror = self._mirror_path(repo_url)
+        objects = os.path.join(mirror, "objects")
+        # The checkout fetches missing blobs into the mirror too, so it holds the lock as well
+        with _mirror_lock(mirror):
+            size_before = _dir_size(objects)
+            if os.path.isdir(objects):
+                _git("-C", mirror, "fetch", "--prune", "origin")
+                mode = "fetch"
+            else:
+                os.makedirs(self.mirror_dir, exist_ok=True)
+                # No --depth: a shallow mirror could not be fast-forwarded by later fetches
+                _git("clone", "--mirror", *(["--filter=blob:none"] if self.filter_blobs else []),
+                     self._remote(repo_url), mirror)
+                mode = "mirror"
+
+            os.rmdir(temp_dir)
+            _git("-C", mirror, "worktree", "add", "--detach", "--no-checkout", temp_dir, "HEAD")
+            self._mirrors[temp_dir] = mirror
+            if self.sparse:
+                self._sparse_checkout(temp_dir)
+            # The worktree starts with an empty index; reset fills it and checks out the (sparse) tree
+            _git("-C", temp_dir, "reset", "--hard", "--quiet", "HEAD")
+            transferred = _dir_size(objects) - size_before
+        # Blobs of the checkout are fetched lazily into the mirror, so they count as transferred too
+        self._record(temp_dir, repo_url, mode, start, transferred)
+
+    def _record(self, repo_path, repo_url, mode, start, bytes_transferred):
+        seconds = time.perf_counter() - start
+        self.stats[repo_path] = {"repo": repo_url, "mode": mode, "seconds": round(seconds, 3),
+                                 "bytes": bytes_transferred}
+        logger.info(f"{mode} of {repo_url} took {seconds:.2f}s, {bytes_transferred / 1024 / 1024:.2f} MB")
+
+    def release(self, repo_path):
+        """
+        Delete a working copy (and its worktree entry in the mirror).
+        """
+        if os.path.exists(repo_path):
+            shutil.rmtree(repo_path, onerror=_remove_readonly)
+        mirror = self._mirrors.pop(repo_path, None)
+        if mirror is not None:
+            with _mirror_lock(mirror):
+                subprocess.run(["git", "-C", mirror, "worktree", "prune"], check=False)
 
 
-def clone_github_repo(repo_url, local_base="D:/temp_repos"):
-    os.makedirs(local_base, exist_ok=True)
-    temp_dir = tempfile.mkdtemp(dir=local_base)
-    try:
-        subprocess.run(["git", "clone", repo_url, temp_dir], check=True)
-        print(f"Repo cloned to: {temp_dir}")
-        return temp_dir
-    except subprocess.CalledProcessError as e:
-        print("Error while cloning repo:", e)
-        shutil.rmtree(temp_dir)
-        return None
+def clone_github_repo(repo_url, local_base=None):
+    return CloneManager(base_dir=local_base).clone(repo_url)
@@ -1,60 +1,340 @@
 import ast
+import functools
+import io
+import logging
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis_cache import content_key
+from file_walker import walk_files
+
+logger = logging.getLogger(__name__)
+
+# Part of the analysis cache key; bump it whenever the result of analyze_source changes shape
+PARSER_VERSION = 3
+
+
+def _source_segment(lines, lineno, col_offset, end_lineno, end_col_offset):
+    """
+    Same result as ast.get_source_segment, but on lines split once per file.
+    """
+    lineno -= 1
+    end_lineno -= 1
+
+    if lineno == end_lineno:
+        return lines[lineno].encode()[col_offset:end_col_offset].decode()
+
+    first = lines[lineno].encode()[col_offset:].decode()
+    last = lines[end_lineno].encode()[:end_col_offset].decode()
+    return first + "".join(lines[lineno + 1:end_lineno]) + last
+
+
+_BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert,
+                 ast.comprehension, ast.match_case)
+
+
+def _signature(node):
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)}):" if bases else f"class {node.name}:"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}:"
+
+
+def _merge_definition(symbol, node, lines):
+    start = min((symbol["lineno"], symbol["col_offset"]), (node.lineno, node.col_offset))
+    end = max((symbol["end_lineno"], symbol["end_col_offset"]), (node.end_lineno, node.end_col_offset))
+    symbol["lineno"], symbol["col_offset"] = start
+    symbol["end_lineno"], symbol["end_col_offset"] = end
+    symbol["source"] = _source_segment(lines, *start, *end)
+
+
+def _walk_tree(tree, code):
+    """
+    Single breadth-first pass (the order ast.walk uses) collecting the file's
+    functions, classes, imports and symbol index.
+
+    Functions (async ones, methods and nested functions included) are listed by
+    qualified name, e.g. "Parser.run" or "outer.inner", so same-named methods of
+    different classes stay distinct symbols. A name defined more than once in the
+    same scope (a property and its setter, a try/except fallback) is listed once,
+    with a span and source covering all of its definitions.
+
+    Every node is visited once; branch points and self./cls. calls are credited
+    to all enclosing functions on the way, so no function subtree is walked again.
+    """
+    lines = io.StringIO(code, newline="").readlines()
+    functions = []
+    classes = []
+    imports = []
+    symbols = {}
+    symbol_names = {}
+
+    queue = deque((child, None, None, ()) for child in ast.iter_child_nodes(tree))
+    while queue:
+        node, parent, parent_class, owners = queue.popleft()
+        qualname = parent
+
+        if isinstance(node, _BRANCH_NODES):
+            for owner in owners:
+                symbols[owner]["complexity"] += 1
+        elif isinstance(node, ast.BoolOp):
+            for owner in owners:
+                symbols[owner]["complexity"] += len(node.values) - 1
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+              and isinstance(node.func.value, ast.Name) and node.func.value.id in ("self", "cls")):
+            for owner in owners:
+                symbols[owner]["calls"].add(node.func.attr)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            module_name = getattr(node, 'module', '')
+            for alias in node.names:
+                imports.append(f"{module_name}.{alias.name}" if module_name else alias.name)
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            qualname = f"{parent}.{node.name}" if parent else node.name
+            if qualname in symbols:
+                # Redefinition (property setter, try/except fallback): one symbol spanning all definitions
+                _merge_definition(symbols[qualname], node, lines)
+                if symbols[qualname]["kind"] == "function":
+                    owners = owners + (qualname,)
+            else:
+                is_class = isinstance(node, ast.ClassDef)
+                symbols[qualname] = {
+                    "name": node.name,
+                    "qualname": qualname,
+                    "kind": "class" if is_class else "function",
+                    "class": None if is_class else parent_class,
+                    # Set for functions defined inside another function (only reachable through it)
+                    "enclosing": parent if owners and owners[-1] == parent else None,
+                    "async": isinstance(node, ast.AsyncFunctionDef),
+                    "lineno": node.lineno,
+                    "end_lineno": node.end_lineno,
+                    "col_offset": node.col_offset,
+                    "end_col_offset": node.end_col_offset,
+                    "signature": _signature(node),
+                    "source": _source_segment(lines, node.lineno, node.col_offset, node.end_lineno,
+                                              node.end_col_offset),
+                }
+                if is_class:
+                    classes.append(node.name)
+                    symbols[qualname]["methods"] = []
+                else:
+                    functions.append(qualname)
+                    symbols[qualname]["complexity"] = 1
+                    symbols[qualname]["calls"] = set()
+                    owners = owners + (qualname,)
+                    symbol_names.setdefault(node.name, qualname)
+                    if parent_class:
+                        symbols[parent_class]["methods"].append(qualname)
+
+        # Only direct children of a class body are methods of that class
+        child_class = qualname if isinstance(node, ast.ClassDef) else None
+        for child in ast.iter_child_nodes(node):
+            queue.append((child, qualname, child_class, owners))
+
+    for symbol in symbols.values():
+        if symbol["kind"] == "function":
+            symbol["calls"] = sorted(symbol["calls"])
+
+    return {
+        "functions": functions,
+        "classes": classes,
+        "imports": imports,
+        "symbols": symbols,
+        "symbol_names": symbol_names
+    }
+
+
+def build_symbol_index(tree, code):
+    """
+    Index every function and class of a parsed file by qualified name.
+
+    Nodes are visited in ast.walk (breadth-first) order, so the bare-name
+    lookup returns the same function the old per-call ast.walk scans did.
+    """
+    analysis = _walk_tree(tree, code)
+    return {"symbols": analysis["symbols"], "symbol_names": analysis["symbol_names"]}
+
+
+def find_symbol(analysis, function_name):
+    """
+    O(1) lookup of a function symbol by qualified or bare name.
+    """
+    symbols = analysis.get("symbols", {})
+    symbol = symbols.get(function_name)
+    if symbol is None or symbol["kind"] != "function":
+        qualname = analysis.get("symbol_names", {}).get(function_name)
+        symbol = symbols.get(qualname) if qualname else None
+    return symbol
+
+
+def symbol_notes(symbol):
+    """
+    Prompt hints for symbols a test cannot simply import and call.
+    """
+    notes = []
+    if symbol is None:
+        return notes
+    if symbol.get("async"):
+        notes.append(f"`{symbol['qualname']}` is a coroutine function: await it inside the test, "
+                     f"e.g. with asyncio.run(), since plain pytest does not run async tests.")
+    if symbol.get("enclosing"):
+        notes.append(f"`{symbol['name']}` is defined inside `{symbol['enclosing']}` and cannot be imported; "
+                     f"test it through `{symbol['enclosing']}`.")
+    return notes
+
+
+def analyze_source(code):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return {"error": str(e)}
+    return _walk_tree(tree, code)
+
+
+@functools.lru_cache(maxsize=32)
+def _file_lines(path, mtime_ns):
+    with open(path, "r", encoding="utf-8") as f:
+        return io.StringIO(f.read(), newline="").readlines()
+
+
+class LazySymbol(dict):
+    """
+    Symbol index entry of a file on disk. Its "source" is not kept with the
+    analysis; it is cut out of the file (recently read files stay cached) each
+    time it is used.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, entry, path):
+        super().__init__(entry)
+        self.path = path
+
+    def __missing__(self, key):
+        if key != "source":
+            raise KeyError(key)
+        lines = _file_lines(self.path, os.stat(self.path).st_mtime_ns)
+        return _source_segment(lines, self["lineno"], self["col_offset"], self["end_lineno"], self["end_col_offset"])
+
+
+def _analyze_path(filepath):
+    # Runs in ProcessPoolExecutor workers, so it has to be a module-level function
+    with open(filepath, 'r', encoding='utf-8') as f:
+        code = f.read()
+    analysis = analyze_source(code)
+    # Sources are read back from the file on demand (LazySymbol), not shipped and stored with the analysis
+    for symbol in analysis.get("symbols", {}).values():
+        del symbol["source"]
+    return filepath, analysis
 
 
 class CodeAnalyzer:
-    def __init__(self, root_dir):
+    """
+    Parses the Python files of a repository into per-file analyses (functions,
+    classes, imports, symbol index).
+
+    With an AnalysisCache, files whose content was analyzed before (by this or an
+    earlier run) are loaded from it without parsing. Results do not hold the file
+    text; symbol sources are read from disk when used.
+    """
+
+    def __init__(self, root_dir, workers=1, cache=None):
         self.root_dir = root_dir
+        self.workers = workers
+        self.cache = cache
         self.analysis_result = {}
+        self.parse_count = 0
+        # Absolute path -> key of analysis_result, for callers with paths spelled differently (coverage data)
+        self._abspaths = {}
+
+    def _parse(self, code):
+        self.parse_count += 1
+        return ast.parse(code)
 
-    def extract_function_code(self, code, function_name):
-        try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):  # FunctionDef to subclass of AST
-                    if node.name == function_name:
-                        return ast.get_source_segment(code, node)
-            return None
-        except Exception as e:
-            print(f"AST error while extracting {function_name}: {e}")
-            return None
+    def extract_function_code(self, data, function_name):
+        """
+        Source of function_name from a file's analysis, or from a {"code": ...} dict.
+        """
+        if "symbols" not in data:
+            code = data.get("code", "")
+            try:
+                data = build_symbol_index(self._parse(code), code)
+            except Exception as e:
+                logger.warning(f"AST error while extracting {function_name}: {e}")
+                return None
+
+        symbol = find_symbol(data, function_name)
+        return symbol["source"] if symbol else None
 
     def analyze(self):
-        for subdir, _, files in os.walk(self.root_dir):
-            for file in files:
-                if file.endswith('.py'):
-                    filepath = os.path.join(subdir, file)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        code = f.read()
-                        analysis = self._analyze_code(code)
-                        analysis["code"] = code
-                        self.analysis_result[filepath] = analysis
-        return self.analysis_result
+        return self._analyze_paths(list(walk_files(self.root_dir, ('.py',))))
+
+    def analyze_files(self, filepaths):
+        """
+        Analyze only the given files (e.g. the ones changed since the last run).
+        Paths that no longer exist are skipped.
+        """
+        return self._analyze_paths([filepath for filepath in filepaths
+                                    if filepath.endswith('.py') and os.path.isfile(filepath)])
 
-    def _analyze_code(self, code):
-        try:
-            tree = ast.parse(code)
-        except SyntaxError as e:
-            return {"error": str(e)}
-
-        functions = []
-        classes = []
-        imports = []
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                functions.append(node.name)
-            elif isinstance(node, ast.ClassDef):
-                classes.append(node.name)
-            elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                module_name = getattr(node, 'module', '')
-                for alias in node.names:
-                    imports.append(f"{module_name}.{alias.name}" if module_name else alias.name)
-
-        return {
-            "functions": functions,
-            "classes": classes,
-            "imports": imports
-        }
+    def file_analysis(self, filepath):
+        """
+        Analysis of one file: the stored result if it was analyzed, else the cached
+        one, parsed only when neither exists. The file is not added to the results.
+        """
+        stored = self._abspaths.get(os.path.abspath(filepath))
+        if stored is not None:
+            return self.analysis_result[stored]
+        key = None
+        if self.cache is not None:
+            with open(filepath, "rb") as f:
+                key = content_key("python", PARSER_VERSION, f.read())
+            cached = self.cache.get_many([key])
+            if key in cached:
+                return cached[key]
+        _, analysis = _analyze_path(filepath)
+        self.parse_count += 1
+        if key is not None:
+            self.cache.put_many({key: analysis})
+        return analysis
 
+    def _analyze_paths(self, filepaths):
+        keys = {}
+        results = {}
+        pending = filepaths
+        if self.cache is not None:
+            for filepath in filepaths:
+                with open(filepath, "rb") as f:
+                    keys[filepath] = content_key("python", PARSER_VERSION, f.read())
+            cached = self.cache.get_many(keys.values())
+            results = {filepath: cached[key] for filepath, key in keys.items() if key in cached}
+            pending = [filepath for filepath in filepaths if filepath not in results]
+
+        if self.workers > 1 and len(pending) > 1:
+            # A few chunks per worker
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parsed = dict(pool.map(_analyze_path, pending, chunksize=chunksize))
+        else:
+            parsed = dict(map(_analyze_path, pending))
+        self.parse_count += len(parsed)
+        results.update(parsed)
+        if self.cache is not None:
+            self.cache.put_many({keys[filepath]: analysis for filepath, analysis in parsed.items()})
+
+        # Walk order is kept: prompt generation caps the number of files it takes
+        for filepath in filepaths:
+            self._store(filepath, results[filepath])
+        return self.analysis_result
 
+    def _store(self, filepath, analysis):
+        # Files with identical content share one cached result, so each gets its own copy
+        analysis = dict(analysis)
+        if "symbols" in analysis:
+            analysis["symbols"] = {qualname: LazySymbol(symbol, filepath)
+                                   for qualname, symbol in analysis["symbols"].items()}
+        self.analysis_result[filepath] = analysis
+        self._abspaths[os.path.abspath(filepath)] = filepath
@@ -0,0 +1,265 @@
+import ast
+import functools
+import os
+import re
+
+CODE_BLOCK_PATTERN = re.compile(r"```(?:python)?(.*?)```", re.DOTALL)
+
+# Imports added when a test uses one of these names without binding it
+KNOWN_IMPORTS = {
+    "pytest": "import pytest",
+    "hypothesis": "import hypothesis",
+    "given": "from hypothesis import given",
+    "settings": "from hypothesis import settings",
+    "assume": "from hypothesis import assume",
+    "example": "from hypothesis import example",
+    "st": "from hypothesis import strategies as st",
+    "strategies": "from hypothesis import strategies",
+}
+
+# LLM często myli lokalne moduły z `sklearn` lub `spin`
+MISTAKEN_UTIL_MODULES = {"sklearn", "spin"}
+
+# Hypothesis settings owned by the fuzz profile of the run (testgen_plugins.fuzz_profiles.PROFILES);
+# values the model picked for them are dropped so the profile applies to every test
+CENTRAL_SETTINGS = {"max_examples", "deadline", "suppress_health_check", "database"}
+
+
+def extract_code_block(response):
+    match = CODE_BLOCK_PATTERN.search(response)
+    return match.group(1).strip() if match else response.strip()
+
+
+@functools.lru_cache(maxsize=1024)
+def module_path(file_path):
+    """
+    Return (dotted module name, directory that has to be on sys.path) for a source
+    file, walking up through packages (directories with an __init__.py).
+    """
+    directory, name = os.path.split(os.path.splitext(os.path.abspath(file_path))[0])
+    parts = [] if name == "__init__" else [name]
+    while os.path.exists(os.path.join(directory, "__init__.py")):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    return ".".join(parts), directory
+
+
+def _is_settings_call(node):
+    return isinstance(node, ast.Call) and (
+        (isinstance(node.func, ast.Name) and node.func.id == "settings")
+        or (isinstance(node.func, ast.Attribute) and node.func.attr == "settings"
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == "hypothesis"))
+
+
+def _central_settings(call):
+    """
+    Source of a settings call without the CENTRAL_SETTINGS keys, None if nothing is left.
+    """
+    keywords = [keyword for keyword in call.keywords if keyword.arg not in CENTRAL_SETTINGS]
+    if not call.args and not keywords:
+        return None
+    return ast.unparse(ast.Call(func=call.func, args=call.args, keywords=keywords))
+
+
+def _header_position(tree):
+    # New imports go after a module docstring and any __future__ imports
+    position = 0
+    for node in tree.body:
+        is_docstring = isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+            and isinstance(node.value.value, str) and position == 0 and node is tree.body[0]
+        is_future = isinstance(node, ast.ImportFrom) and node.module == "__future__"
+        if not (is_docstring or is_future):
+            break
+        position = node.end_lineno
+    return position
+
+
+def _statement_start(node):
+    return min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+
+
+class _TestRewrite:
+    """
+    Line-based edits collected from a single parse of a generated test module.
+    """
+
+    def __init__(self, code, tree):
+        self.lines = code.splitlines()
+        self.tree = tree
+        self.edits = []  # (start, end, replacement lines), 0-based, end exclusive
+
+    def replace(self, node, new_lines):
+        self.edits.append((_statement_start(node) - 1, node.end_lineno, new_lines))
+
+    def insert(self, position, new_lines):
+        self.edits.append((position, position, new_lines))
+
+    def replace_lines(self, node, new_lines):
+        self.edits.append((node.lineno - 1, node.end_lineno, new_lines))
+
+    def render(self):
+        lines = self.lines
+        for start, end, new_lines in sorted(self.edits, key=lambda e: (e[0], e[1]), reverse=True):
+            lines[start:end] = new_lines
+        return "\n".join(lines)
+
+
+def _fix_settings_blocks(rewrite):
+    """
+    Turn `with settings(...):` / `with hypothesis.settings(...):` at the top of a test
+    into a @settings decorator of that test; settings objects are decorators, not
+    context managers.
+    """
+    for function in rewrite.tree.body:
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for statement in function.body:
+            if not (isinstance(statement, ast.With) and len(statement.items) == 1
+                    and statement.items[0].optional_vars is None
+                    and _is_settings_call(statement.items[0].context_expr)):
+                continue
+            indent = " " * function.col_offset
+            call = _central_settings(statement.items[0].context_expr)
+            if call is not None:
+                rewrite.insert(_statement_start(function) - 1, [f"{indent}@{call}"])
+            shift = statement.body[0].col_offset - statement.col_offset
+            body = rewrite.lines[statement.body[0].lineno - 1:statement.end_lineno]
+            rewrite.replace(statement, [line[shift:] if line[:shift].isspace() else line for line in body])
+
+
+def _apply_fuzz_profile(rewrite):
+    """
+    Drop the CENTRAL_SETTINGS keys from @settings(...) decorators, and decorators left empty.
+    """
+    for node in ast.walk(rewrite.tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorator in node.decorator_list:
+            if not _is_settings_call(decorator):
+                continue
+            call = _central_settings(decorator)
+            if call != ast.unparse(decorator):
+                indent = " " * node.col_offset
+                rewrite.replace_lines(decorator, [f"{indent}@{call}"] if call is not None else [])
+
+
+def rewrite_test_code(code, function_name, file_path, tests_dir=None):
+    """
+    Fix the imports of one generated test module in a single parse.
+
+    The target is imported from its package-qualified module (wrong guesses by the
+    model are removed, bare `from module import` of it is qualified); for a method or nested function ("Class.method",
+    "outer.inner") that is its top-level class or function. pytest/hypothesis names
+    used without an import get one, settings context managers become decorators
+    (without the keys the fuzz profile sets), and mistaken `util` imports are
+    pointed back at the package. Code that does not parse is returned unchanged.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+
+    # Methods and nested functions are reached through their top-level class or function
+    target = function_name.split(".")[0]
+    rewrite = _TestRewrite(code, tree)
+    bound = set()
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (bound if isinstance(node.ctx, (ast.Store, ast.Del)) else used).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.Import):
+            bound.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            # Imports of the target itself are checked against its real module below
+            bound.update(alias.asname or alias.name for alias in node.names if alias.name != target)
+
+    qualified, import_root = module_path(file_path)
+    basename = qualified.rsplit(".", 1)[-1]
+    target_imported = False
+    # A bare `from m import ...` of a module inside a package only works with the package
+    # directory itself on sys.path; it is rewritten to the package-qualified module
+    rewrote_basename = False
+    for node in tree.body:
+        if not isinstance(node, ast.ImportFrom) or node.level:
+            continue
+        if node.module in MISTAKEN_UTIL_MODULES and any(alias.name == "util" for alias in node.names):
+            fixed = ast.ImportFrom(module=None, names=node.names, level=1)
+            rewrite.replace(node, [ast.unparse(fixed)])
+            continue
+
+        module = node.module
+        if module == basename and module != qualified:
+            module = qualified
+            rewrote_basename = True
+        kept = []
+        for alias in node.names:
+            if alias.name == target and module != qualified:
+                continue  # the model guessed the wrong module
+            if alias.name == target:
+                target_imported = True
+            kept.append(alias)
+        if len(kept) != len(node.names) or module != node.module:
+            fixed = ast.ImportFrom(module=module, names=kept, level=0)
+            rewrite.replace(node, [ast.unparse(fixed)] if kept else [])
+
+    header = [KNOWN_IMPORTS[name] for name in KNOWN_IMPORTS if name in used and name not in bound]
+    import_target = target in used and target not in bound and not target_imported
+    if import_target or rewrote_basename:
+        relative_root = os.path.relpath(import_root, tests_dir) if tests_dir else ".."
+        path_setup = (f"sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "
+                      f"{relative_root.replace(os.sep, '/')!r})))")
+        header += [line for name, line in (("os", "import os"), ("sys", "import sys")) if name not in bound]
+        if path_setup not in rewrite.lines:
+            header.append(path_setup)
+        if import_target:
+            header.append(f"from {qualified} import {target}")
+
+    _fix_settings_blocks(rewrite)
+    _apply_fuzz_profile(rewrite)
+    if header:
+        rewrite.insert(_header_position(tree), header + [""])
+    return rewrite.render()
+
+
+def split_test_functions(code):
+    """
+    Split a module into one module per top-level test function, each keeping the
+    shared imports, fixtures and helpers (and the test's own decorators). Falls back
+    to splitting at `def test_` lines when the code does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return _split_lines(code)
+
+    tests = [(_statement_start(node) - 1, node.end_lineno) for node in tree.body
+             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")]
+    if len(tests) < 2:
+        return [code]
+    lines = code.splitlines()
+    blocks = []
+    for keep in tests:
+        # Everything except the other tests: imports, fixtures and helpers stay in place
+        dropped = set()
+        for start, end in tests:
+            if (start, end) != keep:
+                dropped.update(range(start, end))
+        blocks.append("\n".join(line for i, line in enumerate(lines) if i not in dropped).strip() + "\n")
+    return blocks
+
+
+def _split_lines(code):
+    blocks = []
+    current = []
+    for line in code.splitlines():
+        if line.strip().startswith("def test_") and current:
+            blocks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
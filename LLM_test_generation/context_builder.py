@@ -0,0 +1,83 @@
+from code_analyzer import find_symbol
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for budgeting (about 4 characters per token for code and English).
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _indented(symbol):
+    # Source segments start at the def keyword; restore the indentation of the first line
+    return " " * symbol["col_offset"] + symbol["source"]
+
+
+class ClassContextBuilder:
+    """
+    Builds the code context of a method under a per-prompt token budget.
+
+    Classes that fit the budget are embedded whole. Larger classes are reduced
+    to the class signature, __init__, the signatures of sibling methods the
+    target calls and the target method itself; every other method is elided.
+    Whatever budget is left goes to the related documentation.
+    """
+
+    def __init__(self, token_budget=1500):
+        self.token_budget = token_budget
+
+    def build(self, data, function_name, doc_snippet=None):
+        """
+        Return (code_context, doc_snippet) for one function of an analyzed file.
+        """
+        symbol = find_symbol(data, function_name)
+        if symbol is None:
+            return None, self._trim_docs(doc_snippet, self.token_budget)
+
+        if not symbol["class"]:
+            context = symbol["source"]
+        else:
+            class_symbol = data["symbols"][symbol["class"]]
+            if estimate_tokens(class_symbol["source"]) <= self.token_budget:
+                context = class_symbol["source"]
+            else:
+                context = self._trimmed_class(data["symbols"], class_symbol, symbol)
+
+        return context, self._trim_docs(doc_snippet, self.token_budget - estimate_tokens(context))
+
+    def _trimmed_class(self, symbols, class_symbol, target):
+        indent = " " * (target["col_offset"])
+        target_code = _indented(target)
+        budget = self.token_budget - estimate_tokens(class_symbol["signature"]) - estimate_tokens(target_code)
+
+        # In order of usefulness: the constructor, then the signatures of the methods the target calls
+        optional = []
+        init = symbols.get(f"{class_symbol['qualname']}.__init__")
+        if init is not None and init is not target:
+            optional.append((init["qualname"], _indented(init)))
+        for name in target["calls"]:
+            sibling = symbols.get(f"{class_symbol['qualname']}.{name}")
+            if sibling is not None and sibling is not target and sibling is not init:
+                optional.append((sibling["qualname"], f"{indent}{sibling['signature']} ..."))
+
+        included = {target["qualname"]}
+        parts = [class_symbol["signature"]]
+        for qualname, code in optional:
+            cost = estimate_tokens(code)
+            if cost <= budget:
+                parts.append(code)
+                included.add(qualname)
+                budget -= cost
+
+        elided = len(class_symbol["methods"]) - len(included)
+        if elided > 0:
+            parts.append(f"{indent}# ... {elided} other methods elided")
+        parts.append(target_code)
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _trim_docs(doc_snippet, budget):
+        if not doc_snippet or budget <= 0:
+            return None
+        max_chars = budget * 4
+        return doc_snippet if len(doc_snippet) <= max_chars else doc_snippet[:max_chars] + "\n..."
@@ -1,76 +1,217 @@
+import logging
 import subprocess
 import json
 import os
 import ast
+import sys
 from collections import defaultdict
 
+import coverage
+import pytest
+
+from code_analyzer import build_symbol_index
+from testgen_plugins import PLUGIN_DIR, coverage_contexts
+
+logger = logging.getLogger(__name__)
+
 
 class CoverageAnalyzer:
-    def __init__(self, test_dir="tests", source_dir=".", report_file="coverage.json"):
+    """
+    Runs the generated tests under coverage with one context per test file.
+
+    With a CoverageMap every run is merged into it, and line_data()/parse_coverage()
+    report the merged coverage of the whole suite, so a run of only the affected
+    test files is enough to refresh it.
+    """
+
+    def __init__(self, test_dir="tests", source_dir=".", report_file="coverage.json", in_process=False,
+                 coverage_map=None, pytest_args=None):
         self.test_dir = test_dir
         self.source_dir = source_dir
         self.report_file = report_file
+        # The coverage data file lives next to the report, so runs with different reports never share it
+        self.data_file = os.path.join(os.path.dirname(os.path.abspath(report_file)), ".coverage")
+        self.in_process = in_process
+        self.coverage_map = coverage_map
+        self.pytest_args = list(pytest_args or [])
+        # Filled by every run: {source path: {"executed", "statements"}},
+        # {test file: {source path: executed lines}} and {source path: lines run outside any test}
+        self._line_data = {}
+        self.test_lines = {}
+        self.import_lines = {}
 
-    def run_coverage(self):
+    def run_coverage(self, test_paths=None):
         """
-        Run pytest with coverage and export as JSON.
+        Run pytest with coverage, in a subprocess that exports JSON or in-process.
+        When test_paths is given only those test files are run.
         """
+        if self.in_process:
+            exit_code = self.run_coverage_in_process(test_paths)
+        else:
+            exit_code = self._run_coverage_subprocess(test_paths)
+        if self.coverage_map is not None:
+            self.coverage_map.update(self.test_lines, self.import_lines, self._line_data, test_paths)
+        return exit_code
+
+    def _run_coverage_subprocess(self, test_paths):
         env = os.environ.copy()
-        env["PYTHONPATH"] = self.source_dir + os.pathsep + env.get("PYTHONPATH", "")
-        print("[+] Running coverage...")
+        # Only the plugin directory is added, after the sources: the rest of the tool stays off the path
+        env["PYTHONPATH"] = os.pathsep.join([self.source_dir, PLUGIN_DIR, env.get("PYTHONPATH", "")])
+        env["COVERAGE_FILE"] = self.data_file
+        logger.info("[+] Running coverage...")
+        # Never let a later parse pick up the report of a previous run
+        if os.path.exists(self.report_file):
+            os.remove(self.report_file)
 
         run_result = subprocess.run(
-            ["coverage", "run", "--source", self.source_dir, "-m", "pytest", self.test_dir],
+            ["coverage", "run", "--source", self.source_dir, "-m", "pytest", "-p", "coverage_contexts",
+             *self.pytest_args, *(test_paths or [self.test_dir])],
             check=False,
             env=env
         )
 
         if run_result.returncode != 0:
-            print(f" pytest failed with exit code {run_result.returncode} — some tests failed.")
+            logger.warning(f"pytest failed with exit code {run_result.returncode} — some tests failed.")
 
         json_result = subprocess.run(
-            ["coverage", "json", "-o", self.report_file],
+            ["coverage", "json", "--show-contexts", "-o", self.report_file],
             check=False,
             env=env
         )
 
         if json_result.returncode != 0:
-            print(f" Failed to generate coverage JSON report (exit code {json_result.returncode}).")
-    def parse_coverage(self):
-        """
-        Parse the generated coverage JSON and return function-level coverage.
-        """
+            logger.error(f"Failed to generate coverage JSON report (exit code {json_result.returncode}).")
+        self._read_report()
+        return run_result.returncode
+
+    def _read_report(self):
+        self._line_data = {}
+        self.test_lines = {}
+        self.import_lines = {}
+        if not os.path.exists(self.report_file):
+            return
         with open(self.report_file, "r") as f:
             data = json.load(f)
 
+        for file_key, file_entry in (data.get("files") or {}).items():
+            source_path = os.path.abspath(file_entry.get("filename", file_key))
+            executed = set(file_entry.get("executed_lines", []))
+            missing = set(file_entry.get("missing_lines", []))
+            self._line_data[source_path] = {
+                "executed": executed,
+                "statements": executed | missing
+            }
+            for lineno, contexts in (file_entry.get("contexts") or {}).items():
+                self._add_contexts(source_path, int(lineno), contexts)
+
+    def _add_contexts(self, source_path, lineno, contexts):
+        for context in contexts:
+            if context:
+                self.test_lines.setdefault(context, {}).setdefault(source_path, set()).add(lineno)
+            else:
+                self.import_lines.setdefault(source_path, set()).add(lineno)
+
+    def run_coverage_in_process(self, test_paths=None):
+        """
+        Run pytest under the coverage API in this process, with one dynamic context
+        per test file. Line data stays in memory (line_data, test_lines); no report
+        file is written and no subprocess is started.
+        """
+        logger.info("[+] Running coverage in-process...")
+        source_dir = os.path.abspath(self.source_dir)
+        self._unload_modules(source_dir)
+
+        cov = coverage.Coverage(source=[source_dir], data_file=None, config_file=False)
+        # The plugin directory too, so "-p fuzz_profiles" in pytest_args resolves as in a subprocess
+        sys.path[:0] = [source_dir, PLUGIN_DIR]
+        cov.start()
+        try:
+            exit_code = pytest.main(["-q", "-p", "no:cacheprovider", *self.pytest_args,
+                                     *(test_paths or [self.test_dir])],
+                                    plugins=[coverage_contexts])
+        finally:
+            cov.stop()
+            sys.path.remove(source_dir)
+            sys.path.remove(PLUGIN_DIR)
+            # Otherwise they would shadow same-named modules of the next repository measured in this process
+            self._unload_modules(source_dir)
+
+        if exit_code != 0:
+            logger.warning(f"pytest failed with exit code {int(exit_code)} — some tests failed.")
+
+        data = cov.get_data()
+        self._line_data = {}
+        self.test_lines = {}
+        self.import_lines = {}
+        for source_path in data.measured_files():
+            _, statements, _, missing, _ = cov.analysis2(source_path)
+            self._line_data[source_path] = {
+                "executed": set(statements) - set(missing),
+                "statements": set(statements)
+            }
+            for lineno, contexts in data.contexts_by_lineno(source_path).items():
+                self._add_contexts(source_path, lineno, contexts)
+        return int(exit_code)
+
+    @staticmethod
+    def _unload_modules(source_dir):
+        """
+        Forget modules imported from the repository (sources and tests) by an in-process
+        run, so a later run re-imports, and measures, them from their current files.
+        """
+        prefix = source_dir + os.sep
+        for name, module in list(sys.modules.items()):
+            module_file = getattr(module, "__file__", None)
+            if module_file and os.path.abspath(module_file).startswith(prefix):
+                del sys.modules[name]
+
+    def line_data(self):
+        """
+        Executed and statement line sets per absolute source path: of the whole
+        suite with a CoverageMap, otherwise of the last run.
+        """
+        if self.coverage_map is not None:
+            return self.coverage_map.line_data()
+        return self._line_data
+
+    def parse_coverage(self, code_results=None):
+        """
+        Parse the collected coverage data and return function-level coverage,
+        {path relative to source_dir: {qualified function name: percent}}.
+
+        Function spans come from the CodeAnalyzer symbol index when
+        code_results is given; only files missing from it are parsed again.
+        """
         file_coverage = defaultdict(dict)
+        analyses = {os.path.abspath(path): analysis for path, analysis in (code_results or {}).items()}
 
-        files = data.get("files")
+        files = self.line_data()
         if not files:
-            print(" No coverage data found. Possibly no tests ran.")
+            logger.warning("No coverage data found. Possibly no tests ran.")
             return {}
 
-        for file_key, file_entry in files.items():
-            file_path = file_entry.get("filename", file_key)
-            summary = file_entry.get("summary", {})
-            executed_lines = set(file_entry.get("executed_lines", []))
-            missing_lines = set(file_entry.get("missing_lines", []))
+        source_dir = os.path.abspath(self.source_dir)
+        for file_path, lines in files.items():
+            executed_lines = lines["executed"]
 
             if not file_path.endswith(".py"):
                 continue
 
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    source = f.read()
-                tree = ast.parse(source)
-            except Exception as e:
-                print(f"Error parsing {file_path}: {e}")
-                continue
+            analysis = analyses.get(file_path)
+            if analysis is None or "symbols" not in analysis:
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        source = f.read()
+                    analysis = build_symbol_index(ast.parse(source), source)
+                except Exception as e:
+                    logger.warning(f"Error parsing {file_path}: {e}")
+                    continue
 
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    func_name = node.name
-                    func_lines = set(range(node.lineno, getattr(node, "end_lineno", node.lineno) + 1))
+            for symbol in analysis["symbols"].values():
+                if symbol["kind"] == "function":
+                    # Qualified, so same-named methods of different classes are reported separately
+                    func_name = symbol["qualname"]
+                    func_lines = set(range(symbol["lineno"], symbol["end_lineno"] + 1))
                     if not func_lines:
                         continue
 
@@ -78,6 +219,6 @@ class CoverageAnalyzer:
                     total = len(func_lines)
                     coverage = (executed / total) * 100 if total > 0 else 0
 
-                    file_name = os.path.basename(file_path)
+                    file_name = os.path.relpath(file_path, source_dir)
                     file_coverage[file_name][func_name] = round(coverage, 1)
         return dict(file_coverage)
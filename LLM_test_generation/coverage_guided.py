@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+
+from code_analyzer import find_symbol
+from context_builder import estimate_tokens
+from repair import has_syntax_error_marker
+
+logger = logging.getLogger(__name__)
+
+
+def function_priority(symbol, line_data):
+    """
+    Uncovered statement lines of a function, weighted up by its complexity.
+    Files without coverage data count every line of the function as uncovered.
+    """
+    span = range(symbol["lineno"], symbol["end_lineno"] + 1)
+    if line_data:
+        statements = line_data["statements"]
+        executed = line_data["executed"]
+        uncovered = sum(1 for line in span if line in statements and line not in executed)
+    else:
+        uncovered = len(span)
+    return uncovered * (1 + math.log(symbol.get("complexity", 1)))
+
+
+class CoveragePriorityQueue:
+    """
+    Max-priority queue of prompts ranked by how uncovered their function is.
+
+    Coverage only ever grows, so priorities only drop: entries are re-scored
+    lazily when they reach the top instead of re-sorting after every update.
+    """
+
+    def __init__(self, code_results, line_data):
+        self.code_results = code_results
+        self.line_data = line_data
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def score(self, item):
+        symbol = find_symbol(self.code_results.get(item["file"], {}), item["function"])
+        if symbol is None:
+            return 0
+        return function_priority(symbol, self.line_data.get(os.path.abspath(item["file"])))
+
+    def push(self, item, score=None):
+        score = self.score(item) if score is None else score
+        heapq.heappush(self._heap, (-score, next(self._counter), item))
+
+    def pop(self):
+        """
+        Return (item, priority) of the least-covered function.
+        """
+        while True:
+            _, _, item = heapq.heappop(self._heap)
+            score = self.score(item)
+            if not self._heap or score >= -self._heap[0][0]:
+                return item, score
+            self.push(item, score)
+
+    def update(self, line_data):
+        """
+        Merge coverage measured for newly accepted tests.
+        """
+        for path, lines in line_data.items():
+            known = self.line_data.setdefault(path, {"executed": set(), "statements": set()})
+            known["executed"] |= lines["executed"]
+            known["statements"] |= lines["statements"]
+
+
+def run_coverage_guided(prompts, code_results, engine, coverage_analyzer, write_tests,
+                        token_budget=None, time_budget=None, validator=None):
+    """
+    Closed generation loop: measure baseline coverage, then generate tests for
+    the least-covered functions first and fold each accepted test's coverage
+    back into the ranking, until the queue or the token/time budget runs out.
+
+    write_tests(prompt, response) writes a response and returns the test paths.
+    With a validator only passing tests are accepted and measured; without one
+    only the files saved with a syntax error are left out.
+    """
+    start = time.monotonic()
+    coverage_analyzer.run_coverage()
+    queue = CoveragePriorityQueue(code_results, coverage_analyzer.line_data())
+    for p in prompts:
+        queue.push(p)
+
+    tokens_used = 0
+    prompts_sent = 0
+    written_tests = []
+    while queue:
+        if token_budget is not None and tokens_used >= token_budget:
+            logger.info(f"[+] Token budget of {token_budget} spent, stopping.")
+            break
+        if time_budget is not None and time.monotonic() - start >= time_budget:
+            logger.info(f"[+] Time budget of {time_budget}s spent, stopping.")
+            break
+
+        batch = []
+        fully_covered = False
+        while queue and len(batch) < engine.max_concurrency:
+            p, score = queue.pop()
+            if score <= 0:
+                # Everything left in the queue is already fully covered
+                fully_covered = True
+                break
+            logger.info(f"[+] Coverage-guided: {p['function']} in {p['file']} (priority {score:.1f})")
+            batch.append(p)
+        if not batch:
+            break
+
+        responses = engine.generate_all(p["prompt"] for p in batch)
+        batch_tests = []
+        for p, response in zip(batch, responses):
+            tokens_used += estimate_tokens(p["prompt"]) + estimate_tokens(response)
+            batch_tests.append(write_tests(p, response))
+        prompts_sent += len(batch)
+
+        if validator is not None:
+            passing = set(validator.accepted(t for tests in batch_tests for t in tests))
+            batch_tests = [[t for t in tests if t in passing] for tests in batch_tests]
+        else:
+            # Unvalidated, but files saved with a syntax error would only fail collection
+            batch_tests = [[t for t in tests if not has_syntax_error_marker(t)] for tests in batch_tests]
+
+        for tests in batch_tests:
+            if tests:
+                written_tests.extend(tests)
+                coverage_analyzer.run_coverage(tests)
+                queue.update(coverage_analyzer.line_data())
+        if fully_covered:
+            break
+
+    logger.info(f"[+] Coverage-guided run: {prompts_sent} prompts, ~{tokens_used} tokens, "
+                f"{time.monotonic() - start:.1f}s")
+    return written_tests
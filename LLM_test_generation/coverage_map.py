@@ -0,0 +1,189 @@
+import ast
+import functools
+import json
+import logging
+import os
+
+from code_analyzer import build_symbol_index
+
+logger = logging.getLogger(__name__)
+
+# Pseudo test holding the lines run outside any test (module imports during collection)
+IMPORT_TEST = "<import>"
+# Pseudo function holding the lines outside any function, stored as absolute line numbers
+MODULE_LEVEL = "<module>"
+
+
+def _spans_of(symbols):
+    """
+    ({line: (qualname, def line)} of the innermost function owning each line,
+    {qualname: def line}) from a symbol index.
+    """
+    spans = sorted((s["lineno"], s["end_lineno"], qualname) for qualname, s in symbols.items()
+                   if s["kind"] == "function")
+    owners = {}
+    # Outer functions start first, so nested ones overwrite their lines afterwards
+    for lineno, end_lineno, qualname in spans:
+        for line in range(lineno, end_lineno + 1):
+            owners[line] = (qualname, lineno)
+    return owners, {qualname: lineno for lineno, _, qualname in spans}
+
+
+@functools.lru_cache(maxsize=256)
+def _function_spans(path, mtime_ns):
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    return _spans_of(build_symbol_index(ast.parse(source), source)["symbols"])
+
+
+def _spans(path):
+    try:
+        return _function_spans(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.warning(f"Error parsing {path}: {e}")
+        return {}, {}
+
+
+class CoverageMap:
+    """
+    Which generated test files cover which functions, and the lines each of them
+    runs, kept between runs so a coverage refresh only has to re-run the tests
+    affected by a change and merge their results into the rest.
+
+    Layout: {"tests": {test: {source: {qualname: [lines]}}}, "statements": {source: {qualname: [lines]}}}
+    with paths relative to root_dir. Lines are stored relative to the def line of
+    their function, so they stay valid when other functions of the file move or
+    change; lines outside any function (MODULE_LEVEL) are absolute.
+
+    Function spans come from the symbol index of analyzer (a CodeAnalyzer, whose
+    analysis cache covers the files it did not analyze in this run); without
+    one, the sources are parsed.
+    """
+
+    def __init__(self, path, root_dir, analyzer=None):
+        self.path = path
+        self.root_dir = os.path.abspath(root_dir)
+        self.analyzer = analyzer
+        self._analyzer_spans = {}
+        self.tests = {}
+        self.statements = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.tests = data.get("tests", {})
+            self.statements = data.get("statements", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            # Thousands of test files: keep it compact, unlike the manifest
+            json.dump({"tests": self.tests, "statements": self.statements}, f, separators=(",", ":"))
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root_dir)
+
+    def _spans(self, path):
+        """
+        Function spans of a source file as _spans_of returns them, None if it no longer exists.
+        """
+        if self.analyzer is None:
+            return _spans(path)
+        path = os.path.abspath(path)
+        if path not in self._analyzer_spans:
+            if not os.path.exists(path):
+                return None
+            try:
+                analysis = self.analyzer.file_analysis(path)
+            except (OSError, ValueError) as e:
+                analysis = {"error": str(e)}
+            if "symbols" not in analysis:
+                logger.warning(f"Error parsing {path}: {analysis.get('error')}")
+            self._analyzer_spans[path] = _spans_of(analysis.get("symbols", {}))
+        return self._analyzer_spans[path]
+
+    def _encode(self, path, lines):
+        owners, _ = self._spans(path) or ({}, {})
+        encoded = {}
+        for line in lines:
+            qualname, start = owners.get(line, (MODULE_LEVEL, 0))
+            encoded.setdefault(qualname, []).append(line - start)
+        for offsets in encoded.values():
+            offsets.sort()
+        return encoded
+
+    @staticmethod
+    def _decode(starts, encoded):
+        lines = set()
+        for qualname, offsets in encoded.items():
+            start = 0 if qualname == MODULE_LEVEL else starts.get(qualname)
+            if start is not None:  # functions removed since are dropped
+                lines.update(start + offset for offset in offsets)
+        return lines
+
+    def update(self, test_lines, import_lines, line_data, test_paths=None):
+        """
+        Merge one coverage run of test_paths (None: the whole test directory).
+
+        test_lines is {test file: {source: executed lines}}, import_lines {source:
+        lines run outside any test} and line_data {source: {"executed", "statements"}}
+        as CoverageAnalyzer collects them. The tests that were run replace their old
+        entries; every other test keeps its data.
+        """
+        if test_paths is None:
+            self.tests = {}
+        else:
+            for test_path in test_paths:
+                self.tests.pop(self._rel(test_path), None)
+        # Tests deleted or rejected since they were measured no longer count
+        self.tests = {test: sources for test, sources in self.tests.items()
+                      if test == IMPORT_TEST or os.path.exists(os.path.join(self.root_dir, test))}
+
+        for test_path, sources in test_lines.items():
+            self.tests[self._rel(test_path)] = {self._rel(source): self._encode(source, lines)
+                                                for source, lines in sources.items()}
+        imports = self.tests.setdefault(IMPORT_TEST, {})
+        for source, lines in import_lines.items():
+            imports[self._rel(source)] = self._encode(source, lines)
+        for source, lines in line_data.items():
+            self.statements[self._rel(source)] = self._encode(source, lines["statements"])
+
+    def line_data(self):
+        """
+        Merged {absolute source path: {"executed", "statements"}} over every test,
+        in the current line numbers of the sources.
+        """
+        starts = {}
+        lines = {}
+        for source, encoded in self.statements.items():
+            path = os.path.join(self.root_dir, source)
+            spans = self._spans(path)
+            if spans is None:
+                continue
+            starts[source] = spans[1]
+            lines[source] = {"executed": set(), "statements": self._decode(spans[1], encoded)}
+
+        for sources in self.tests.values():
+            for source, encoded in sources.items():
+                if source in lines:
+                    lines[source]["executed"] |= self._decode(starts[source], encoded)
+        for entry in lines.values():
+            entry["executed"] &= entry["statements"]
+        return {os.path.join(self.root_dir, source): entry for source, entry in lines.items()}
+
+    def tests_covering(self, functions):
+        """
+        Absolute paths of the test files that ran any of functions, given as
+        (source path, qualified name) pairs.
+        """
+        wanted = {}
+        for source, qualname in functions:
+            wanted.setdefault(self._rel(source), set()).add(qualname)
+        found = []
+        for test, sources in self.tests.items():
+            if test == IMPORT_TEST:
+                continue
+            if any(not wanted[source].isdisjoint(sources[source]) for source in wanted.keys() & sources.keys()):
+                found.append(os.path.join(self.root_dir, test))
+        return found
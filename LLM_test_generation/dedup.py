@@ -0,0 +1,147 @@
+import ast
+import copy
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Normalizer(ast.NodeTransformer):
+    """
+    Rewrites a test function so that tests differing only in their name, local
+    variable names, literal values or docstring produce the same dump.
+    """
+
+    def __init__(self):
+        self.names = {}
+
+    def _canonical(self, name):
+        return self.names.setdefault(name, f"_v{len(self.names)}")
+
+    def visit_FunctionDef(self, node):
+        node.name = "_test"
+        if (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant)
+                and isinstance(node.body[0].value.value, str) and len(node.body) > 1):
+            node.body = node.body[1:]
+        return self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        node.arg = self._canonical(node.arg)
+        node.annotation = None
+        return node
+
+    def visit_Name(self, node):
+        # Only names bound in the test are renamed; the function under test and modules keep theirs
+        if isinstance(node.ctx, ast.Store) or node.id in self.names:
+            node.id = self._canonical(node.id)
+        return node
+
+    def visit_Constant(self, node):
+        return ast.Constant(value=type(node.value).__name__)
+
+
+def test_fingerprint(node):
+    """
+    Structural fingerprint of a test function AST node.
+    """
+    return ast.dump(_Normalizer().visit(copy.deepcopy(node)), annotate_fields=False)
+
+
+class TestDeduplicator:
+    """
+    Drops generated tests that are structural duplicates of tests already written
+    in this run, and test files whose coverage adds nothing to the kept ones.
+    """
+
+    def __init__(self, redundant_dir=None):
+        self.redundant_dir = redundant_dir
+        self.seen = set()
+        self.duplicates = 0
+        self.pruned = 0
+        self._lock = threading.Lock()
+
+    def filter_source(self, code):
+        """
+        Remove top-level test functions already seen (by fingerprint) from a test
+        file. Returns the remaining code, or None if every test in it was a duplicate.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return code
+
+        drop = []
+        tests = 0
+        with self._lock:
+            for node in tree.body:
+                if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) or not node.name.startswith("test"):
+                    continue
+                tests += 1
+                fingerprint = test_fingerprint(node)
+                if fingerprint in self.seen:
+                    start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+                    drop.append((start, node.end_lineno))
+                else:
+                    self.seen.add(fingerprint)
+            self.duplicates += len(drop)
+
+        if not drop:
+            return code
+        if len(drop) == tests:
+            return None
+        lines = code.splitlines(keepends=True)
+        for start, end in reversed(drop):
+            del lines[start - 1:end]
+        return "".join(lines)
+
+    def prune(self, test_paths, test_lines, test_dir=None):
+        """
+        Keep a minimal subset of test_paths with the same line coverage.
+
+        test_lines maps test files to {source file: executed lines} (one coverage
+        context per test file, as CoverageAnalyzer.run_coverage records it). Tests
+        are taken largest coverage first and kept only if they cover a line no kept
+        test covers; the others are moved to redundant_dir.
+
+        A test without measured source lines is kept: its coverage is unknown (it
+        may only check module-level state, which runs at import), not redundant.
+        """
+        test_paths = list(test_paths)
+        if not test_lines:
+            # Nothing was measured (e.g. the run failed to import); pruning would drop everything
+            return test_paths
+
+        excluded = os.path.abspath(test_dir) + os.sep if test_dir else None
+        coverage = {}
+        for test_path in test_paths:
+            covered = set()
+            for source_path, lines in test_lines.get(os.path.abspath(test_path), {}).items():
+                if excluded is None or not os.path.abspath(source_path).startswith(excluded):
+                    covered.update((source_path, line) for line in lines)
+            coverage[test_path] = covered
+
+        kept, covered = [], set()
+        for test_path in sorted(test_paths, key=lambda t: (-len(coverage[t]), t)):
+            # Unknown coverage counts as new, so at least one test always survives
+            if not coverage[test_path] or coverage[test_path] - covered:
+                kept.append(test_path)
+                covered |= coverage[test_path]
+            else:
+                self._set_aside(test_path)
+
+        self.pruned += len(test_paths) - len(kept)
+        logger.info(f"[+] Kept {len(kept)} of {len(test_paths)} test files with the same coverage "
+                    f"({len(covered)} lines)")
+        kept = set(kept)
+        return [test_path for test_path in test_paths if test_path in kept]
+
+    def _set_aside(self, test_path):
+        if self.redundant_dir is None:
+            os.remove(test_path)
+            return
+        os.makedirs(self.redundant_dir, exist_ok=True)
+        shutil.move(test_path, os.path.join(self.redundant_dir, os.path.basename(test_path)))
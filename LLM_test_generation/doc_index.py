@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+# Zbyt ogólne sekcje (np. "Changelog", "Performance") nigdy nie trafiają do promptów
+FORBIDDEN_HEADINGS = ["changelog", "performance", "installation", "license", "contributing"]
+
+IDENTIFIER_PATTERN = re.compile(r"[a-z_][a-z0-9_]*")
+
+# Minimalna trafność sekcji: nagłówek równy nazwie funkcji (20) albo wzmianka
+# w treści (10) i trafienia słów kluczowych z nazwy (po 1)
+HEADING_MATCH = 20
+CONTENT_MENTION = 10
+MIN_RELEVANCE = 15
+
+
+def is_valid_section(title):
+    return not any(word in title.lower() for word in FORBIDDEN_HEADINGS)
+
+
+def tokenize(text_lower):
+    """
+    Identifiers of a lowercased text, plus the parts of snake_case identifiers.
+    """
+    tokens = []
+    for token in IDENTIFIER_PATTERN.findall(text_lower):
+        tokens.append(token)
+        if "_" in token.strip("_"):
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+class DocIndex:
+    """
+    Inverted index over documentation sections with BM25 scoring.
+
+    Built once per run from DocReader output; a query touches only the postings
+    of the function name and its snake_case parts instead of every section.
+    """
+
+    def __init__(self, docs_data, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.sections = []  # (doc_path, heading, sections of the doc); content is read from it on demand
+        self.lengths = []
+        self.postings = defaultdict(dict)  # term -> {section id: term frequency}
+        self.headings = defaultdict(list)  # lowercased heading -> section ids
+
+        for doc_path, doc_info in docs_data.items():
+            sections = doc_info.get("sections", {})
+            for heading, content in sections.items():
+                if not is_valid_section(heading):
+                    continue
+                section_id = len(self.sections)
+                self.sections.append((doc_path, heading, sections))
+                self.headings[heading.lower()].append(section_id)
+
+                terms = Counter(tokenize(heading.lower()))
+                terms.update(tokenize(content.lower()))
+                self.lengths.append(sum(terms.values()))
+                for term, frequency in terms.items():
+                    self.postings[term][section_id] = frequency
+            if hasattr(sections, "close"):
+                # DocReader's lazy sections keep their file mapped while open; index one file at a time
+                sections.close()
+
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+
+    def __len__(self):
+        return len(self.sections)
+
+    def _idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.sections) - df + 0.5) / (df + 0.5))
+
+    def relevance(self, section_id, target, keywords):
+        """
+        Relevance of a section to a lowercased function name: HEADING_MATCH for an
+        exact heading, CONTENT_MENTION if the text contains the identifier, plus one
+        per snake_case keyword of the name found in the section.
+        """
+        score = HEADING_MATCH if self.sections[section_id][1].lower() == target else 0
+        if section_id in self.postings.get(target, {}):
+            score += CONTENT_MENTION
+        return score + sum(1 for k in keywords if section_id in self.postings.get(k, {}))
+
+    def query(self, function_name, top_k=1, min_relevance=MIN_RELEVANCE):
+        """
+        Return up to top_k (heading, content, score) for sections mentioning function_name.
+
+        Only sections whose heading is the function name or whose text contains the
+        full identifier are candidates, and only those reaching min_relevance are
+        kept; they are ranked by BM25 over the identifier and its snake_case parts,
+        with an exact heading match ranked first.
+        """
+        target = function_name.lower()
+        candidates = set(self.headings.get(target, ()))
+        candidates.update(self.postings.get(target, {}))
+        keywords = [k for k in target.split("_") if k]
+        candidates = {section_id for section_id in candidates
+                      if self.relevance(section_id, target, keywords) >= min_relevance}
+        if not candidates:
+            return []
+
+        terms = list(dict.fromkeys([target] + keywords))
+        scores = {}
+        for section_id in candidates:
+            length_norm = self.k1 * (1 - self.b + self.b * self.lengths[section_id] / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                frequency = self.postings.get(term, {}).get(section_id, 0)
+                if frequency:
+                    score += self._idf(term) * frequency * (self.k1 + 1) / (frequency + length_norm)
+            if self.sections[section_id][1].lower() == target:
+                score += 100
+            scores[section_id] = score
+
+        best = sorted(scores, key=lambda section_id: (-scores[section_id], section_id))[:top_k]
+        return [(self.sections[s][1], self.sections[s][2][self.sections[s][1]], scores[s]) for s in best]
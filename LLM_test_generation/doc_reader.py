@@ -1,73 +1,214 @@
-import os
+import logging
+import mmap
 import re
-import spacy
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis_cache import content_key
+from doc_index import DocIndex
+from file_walker import walk_files
+
+logger = logging.getLogger(__name__)
+
+# One alternative per kind of line that matters, tried at every line start in a single scan:
+# a code fence, a Markdown "# heading", or an RST/setext title followed by its underline
+# (backtick underlines are left out: they are indistinguishable from a closing fence)
+SECTION_PATTERN = re.compile(
+    rb"^(?P<fence>[ \t]{0,3}```)"
+    rb"|^[ \t]{0,3}#{1,6}[ \t]+(?P<md>[^\n]*)"
+    rb"|^(?P<rst>[ \t]*\S[^\n]*)\r?\n[ \t]*(?P<underline>[=\-~:^'\"])(?P=underline){2,}[ \t]*\r?$",
+    re.MULTILINE)
+EXAMPLE_PATTERN = re.compile(rb"```[\s\S]*?```|::\r?\n\r?\n(?: {4}|\t).+")
+
+RAW_PREVIEW_BYTES = 1000
+
+# Part of the analysis cache key; bump it whenever parse_sections or the cached fields change
+PARSER_VERSION = 1
+
+
+def parse_sections(buffer):
+    """
+    Find the headings of a Markdown/RST document (bytes or an mmap) in one linear pass.
+
+    Returns (headings in document order, {title: [(start, end), ...]} byte spans
+    of each section's body, examples). A section runs to the next heading of either
+    kind; headings inside fenced code blocks are ignored. A title used more than
+    once keeps every span.
+    """
+    headings = []
+    spans = {}
+    in_fence = False
+    open_title, open_start = None, None
+
+    for match in SECTION_PATTERN.finditer(buffer):
+        if match.group("fence") is not None:
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        raw_title = match.group("md") if match.group("md") is not None else match.group("rst")
+        title = raw_title.decode("utf-8", errors="ignore").strip().rstrip("#").strip()
+        if not title:
+            continue
+        if open_title is not None:
+            spans[open_title].append((open_start, match.start()))
+        headings.append(title)
+        spans.setdefault(title, [])
+        open_title, open_start = title, match.end()
+
+    if open_title is not None:
+        spans[open_title].append((open_start, len(buffer)))
+    examples = [m.group().decode("utf-8", errors="ignore") for m in EXAMPLE_PATTERN.finditer(buffer)]
+    return headings, spans, examples
+
+
+class LazySections(Mapping):
+    """
+    Section title -> section text, kept as byte offsets into the document and
+    decoded only when a section is read.
+
+    For a file the text is read through a read-only mmap, opened on first access;
+    close() releases it (it is reopened if needed again). Pickling drops the
+    mapping, so instances cross process boundaries as offsets only.
+    """
+
+    def __init__(self, spans, path=None, data=None):
+        self.spans = spans
+        self.path = path
+        self._data = data
+
+    def _buffer(self):
+        if self._data is None:
+            with open(self.path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def __getitem__(self, title):
+        buffer = self._buffer()
+        return "\n\n".join(buffer[start:end].decode("utf-8", errors="ignore").strip()
+                           for start, end in self.spans[title])
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __len__(self):
+        return len(self.spans)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+            self._data = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self.path is not None:
+            state["_data"] = None
+        return state
+
+
+def _read_doc(filepath):
+    # Runs in ProcessPoolExecutor workers, so it has to be a module-level function
+    try:
+        with open(filepath, "rb") as f:
+            if f.seek(0, 2) == 0:
+                return filepath, None, None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                headings, spans, examples = parse_sections(buffer)
+                raw = buffer[:RAW_PREVIEW_BYTES].decode("utf-8", errors="ignore")
+    except (OSError, ValueError) as e:
+        return filepath, None, str(e)
+
+    return filepath, _make_doc(filepath, headings, spans, examples, raw), None
+
+
+def _make_doc(filepath, headings, spans, examples, raw):
+    if not headings and not examples:
+        return None
+    return {"headings": headings, "examples": examples, "sections": LazySections(spans, path=filepath), "raw": raw}
+
+
+def _cache_entry(doc):
+    if doc is None:
+        return {"headings": [], "spans": {}, "examples": [], "raw": ""}
+    return {"headings": doc["headings"], "spans": doc["sections"].spans, "examples": doc["examples"],
+            "raw": doc["raw"]}
 
 
 class DocReader:
-    def __init__(self, root_dir):
+    def __init__(self, root_dir, workers=1, cache=None):
         self.root_dir = root_dir
+        self.workers = workers
+        self.cache = cache
         self.docs_data = {}
-        self.nlp = spacy.load("en_core_web_sm")
+        self.index = None
+        self._nlp = None
+
+    @property
+    def nlp(self):
+        """
+        spaCy pipeline, loaded on first use only (it costs seconds and hundreds of MB).
+        """
+        if self._nlp is None:
+            import spacy
+            self._nlp = spacy.load("en_core_web_sm")
+        return self._nlp
 
     def read_docs(self):
-        for subdir, _, files in os.walk(self.root_dir):
-            for file in files:
-                if file.endswith(('.md', '.rst')):
-                    filepath = os.path.join(subdir, file)
-                    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-
-                    if len(content) > 10000:
-                        content = content[:10000]
-
-                    if not ('#' in content or '```' in content):
-                        continue
-
-                    try:
-                        self.docs_data[filepath] = self.analyze_text(content)
-                    except Exception as e:
-                        print(f"Error in {filepath}: {e}")
+        filepaths = list(walk_files(self.root_dir, ('.md', '.rst')))
+        keys = {}
+        cached = {}
+        pending = filepaths
+        if self.cache is not None:
+            # Unchanged documents keep their section offsets from the cache and are not scanned again
+            for filepath in filepaths:
+                with open(filepath, "rb") as f:
+                    keys[filepath] = content_key("docs", PARSER_VERSION, f.read())
+            found = self.cache.get_many(keys.values())
+            for filepath, key in keys.items():
+                if key in found:
+                    entry = found[key]
+                    cached[filepath] = _make_doc(filepath, entry["headings"], entry["spans"], entry["examples"],
+                                                 entry["raw"])
+            pending = [filepath for filepath in filepaths if filepath not in cached]
+
+        if self.workers > 1 and len(pending) > 1:
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parsed = list(pool.map(_read_doc, pending, chunksize=chunksize))
+        else:
+            parsed = list(map(_read_doc, pending))
+
+        results = {filepath: (doc, error) for filepath, doc, error in parsed}
+        if self.cache is not None:
+            self.cache.put_many({keys[filepath]: _cache_entry(doc) for filepath, (doc, error) in results.items()
+                                 if not error})
+        results.update((filepath, (doc, None)) for filepath, doc in cached.items())
+
+        for filepath in filepaths:
+            doc, error = results[filepath]
+            if error:
+                logger.warning(f"Error in {filepath}: {error}")
+            elif doc is not None:
+                self.docs_data[filepath] = doc
+        self.index = DocIndex(self.docs_data)
+        self.close()
         return self.docs_data
 
-    def analyze_text(self, text):
-        headings = []
-        sections = {}
-
-        # Markdown-style headers (e.g., ### Header)
-        md_pattern = re.compile(r'^\s{0,3}(#{1,6})\s+(.*)', re.MULTILINE)
-        matches = list(md_pattern.finditer(text))
-
-        for i, match in enumerate(matches):
-            level, title = match.groups()
-            headings.append(title.strip())
-            start = match.end()
-            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-            section_content = text[start:end].strip()
-            sections[title.strip()] = section_content
-
-        # RST-style headers (e.g., underlined ===)
-        rst_lines = text.splitlines()
-        for i in range(1, len(rst_lines)):
-            if re.match(r'^[=\-`~:\^\'"]{3,}$', rst_lines[i].strip()):
-                title = rst_lines[i - 1].strip()
-                headings.append(title)
-                start = text.find(title)
-                next_title = None
-                for j in range(i + 1, len(rst_lines)):
-                    if re.match(r'^[=\-`~:\^\'"]{3,}$', rst_lines[j].strip()):
-                        next_title = rst_lines[j - 1].strip()
-                        break
-                end = text.find(next_title) if next_title else len(text)
-                section_content = text[start:end].strip()
-                sections[title] = section_content
-
-        # Code examples
-        code_blocks = re.findall(r'```[\s\S]*?```', text, re.MULTILINE)
-        code_blocks += re.findall(r'::\n\n(?: {4}|\t).+', text, re.MULTILINE)
+    def close(self):
+        """
+        Release the memory maps of sections read so far.
+        """
+        for doc in self.docs_data.values():
+            if isinstance(doc["sections"], LazySections):
+                doc["sections"].close()
 
+    @staticmethod
+    def analyze_text(text):
+        data = text.encode("utf-8")
+        headings, spans, examples = parse_sections(data)
         return {
             "headings": headings,
-            "examples": code_blocks,
-            "sections": sections,
-            "raw": text[:1000]
+            "examples": examples,
+            "sections": LazySections(spans, data=data),
+            "raw": text[:RAW_PREVIEW_BYTES]
         }
@@ -0,0 +1,125 @@
+import os
+import re
+
+# Directories that never hold the project's own sources, wherever they are
+SKIP_DIRS = {
+    ".git", ".hg", ".svn", ".tox", ".nox", "node_modules", "site-packages",
+    "__pycache__", ".eggs", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+}
+
+# Conventional names of virtualenvs and bundled dependencies, skipped at the repository root only:
+# deeper down a package may well be called env or vendor. Virtualenvs elsewhere are found by pyvenv.cfg.
+ROOT_SKIP_DIRS = {".venv", "venv", "env", ".env", "vendor", "vendored", "third_party"}
+
+
+def _glob_to_regex(pattern):
+    regex = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            regex.append("[" + pattern[i + 1:end].replace("!", "^", 1) + "]")
+            i = end + 1
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(regex)
+
+
+class GitIgnore:
+    """
+    The subset of .gitignore semantics needed to prune a walk: comments,
+    negation, directory-only and anchored patterns, and ** wildcards, with
+    nested .gitignore files applying below their own directory.
+    """
+
+    def __init__(self):
+        self.rules = {}  # base dir relative to root -> [(compiled regex, negate, dir_only)]
+
+    def add_file(self, gitignore_path, base):
+        try:
+            with open(gitignore_path, "r", encoding="utf-8", errors="ignore") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            regex = _glob_to_regex(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self.rules.setdefault(base, []).append((re.compile(regex + "$"), negate, dir_only))
+
+    def is_ignored(self, rel_path, is_dir):
+        # Only the .gitignore files of the path's ancestors apply, shallowest first so deeper ones win;
+        # looking them up by directory keeps a check independent of how many the tree has
+        ignored = False
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            base = "/".join(parts[:depth])
+            rules = self.rules.get(base)
+            if not rules:
+                continue
+            path = rel_path[len(base) + 1:] if base else rel_path
+            for regex, negate, dir_only in rules:
+                if dir_only and not is_dir:
+                    continue
+                if regex.match(path):
+                    ignored = not negate
+        return ignored
+
+
+def walk_files(root_dir, extensions):
+    """
+    Yield paths of files under root_dir ending with one of extensions, skipping
+    .gitignore'd paths, tooling directories, virtualenvs and vendored
+    dependencies at the root.
+    """
+    gitignore = GitIgnore()
+    for subdir, dirs, files in os.walk(root_dir):
+        rel_dir = os.path.relpath(subdir, root_dir).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        if ".gitignore" in files:
+            gitignore.add_file(os.path.join(subdir, ".gitignore"), rel_dir)
+
+        kept = []
+        for d in dirs:
+            rel_path = f"{rel_dir}/{d}" if rel_dir else d
+            if d in SKIP_DIRS or (not rel_dir and d in ROOT_SKIP_DIRS):
+                continue
+            if os.path.exists(os.path.join(subdir, d, "pyvenv.cfg")):
+                continue
+            if gitignore.is_ignored(rel_path, is_dir=True):
+                continue
+            kept.append(d)
+        dirs[:] = kept
+
+        for file in files:
+            if file.endswith(extensions):
+                rel_path = f"{rel_dir}/{file}" if rel_dir else file
+                if not gitignore.is_ignored(rel_path, is_dir=False):
+                    yield os.path.join(subdir, file)
@@ -1,13 +1,22 @@
+import logging
 import re
 
+from code_analyzer import find_symbol, symbol_notes
+from generation_engine import GenerationEngine
+
+logger = logging.getLogger(__name__)
+
+
 class FuzzTestGenerator:
-    def __init__(self, extract_function_code_func, llm_client):
+    def __init__(self, extract_function_code_func, llm_client, engine=None):
         self.extract_function_code = extract_function_code_func
         self.llm_client = llm_client
+        self.engine = engine or GenerationEngine(llm_client, max_concurrency=1)
 
-    def generate_fuzz_prompt(self, file_path, function_name, source_code, imports=None):
+    def generate_fuzz_prompt(self, file_path, function_name, analysis, imports=None):
         imports = imports or []
-        function_code = self.extract_function_code(source_code, function_name)
+        function_code = self.extract_function_code(analysis, function_name)
+        notes = symbol_notes(find_symbol(analysis, function_name)) if "symbols" in analysis else []
 
         prompt = f"""
 # File: {file_path}
@@ -21,6 +30,8 @@ Write Python fuzz tests using the `hypothesis` library to test the function `{fu
 Cover edge cases, type variability, and invalid input combinations if applicable.
 The tests must be compatible with pytest and include assert statements to verify correctness.
 """
+        for note in notes:
+            prompt += f"{note}\n"
         return prompt
 
     def auto_append_assertion(self, test_code: str, function_name: str) -> str:
@@ -30,8 +41,9 @@ The tests must be compatible with pytest and include assert statements to verify
         if "assert" in test_code:
             return test_code  # Already has assertions
 
-        # Try to locate function call in test
-        match = re.search(rf"(\w+)\s*=\s*{function_name}\(.*?\)", test_code)
+        # Try to locate function call in test; methods are called as obj.method(...)
+        name = re.escape(function_name.rsplit(".", 1)[-1])
+        match = re.search(rf"(\w+)\s*=\s*(?:[\w.]+\.)?{name}\(.*?\)", test_code)
         if match:
             var_name = match.group(1)
         else:
@@ -50,33 +62,44 @@ The tests must be compatible with pytest and include assert statements to verify
                 break
         return "\n".join(lines)
 
-    def generate_tests_for_functions(self, code_analysis_results, max_files=10):
-        fuzz_tests = []
+    def build_prompts(self, code_analysis_results, max_files=10):
+        prompts = []
 
         for i, (file_path, data) in enumerate(code_analysis_results.items()):
-            if i >= max_files:
+            if max_files is not None and i >= max_files:
                 break
-            source_code = data.get("code", "")
             imports = data.get("imports", [])
 
             for function_name in data.get("functions", []):
                 prompt = self.generate_fuzz_prompt(
                     file_path=file_path,
                     function_name=function_name,
-                    source_code=source_code,
+                    analysis=data,
                     imports=imports
                 )
-                print(f"[+] Generating fuzz test for: {function_name}")
-                response = self.llm_client.generate(prompt)
-
-                if response:
-                    response = self.auto_append_assertion(response, function_name)
-
-                fuzz_tests.append({
+                prompts.append({
                     "file": file_path,
                     "function": function_name,
-                    "prompt": prompt,
-                    "response": response
+                    "prompt": prompt
                 })
 
+        return prompts
+
+    def generate_tests_for_functions(self, code_analysis_results, max_files=10, batcher=None):
+        """
+        With a PromptBatcher, small functions of the same file share one LLM call.
+        """
+        fuzz_tests = self.build_prompts(code_analysis_results, max_files)
+
+        logger.info(f"[+] Generating fuzz tests for {len(fuzz_tests)} functions")
+        if batcher is not None:
+            responses = batcher.generate_all(self.engine, fuzz_tests, code_analysis_results, test_type="fuzz")
+        else:
+            responses = self.engine.generate_all(t["prompt"] for t in fuzz_tests)
+
+        for test, response in zip(fuzz_tests, responses):
+            if response:
+                response = self.auto_append_assertion(response, test["function"])
+            test["response"] = response
+
         return fuzz_tests
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class GenerationEngine:
+    """
+    Sends many prompts through one LLM client with a bounded number in flight.
+    """
+
+    def __init__(self, llm_client, max_concurrency=4):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.llm_client = llm_client
+        self.max_concurrency = max_concurrency
+
+    def generate_all(self, prompts, temperature=0.2, max_tokens=None):
+        """
+        Generate a response for every prompt. Results are returned in input order,
+        with None for prompts whose request failed.
+        """
+        prompts = list(prompts)
+        if not prompts:
+            return []
+
+        def generate_one(prompt):
+            return self.llm_client.generate(prompt, temperature=temperature, max_tokens=max_tokens)
+
+        # Ollama serves up to OLLAMA_NUM_PARALLEL requests at once; more workers only queue server-side
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts))) as pool:
+            return list(pool.map(generate_one, prompts))
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+
+from code_analyzer import find_symbol
+
+logger = logging.getLogger(__name__)
+
+
+def git_head(repo_path):
+    result = subprocess.run(["git", "-C", repo_path, "rev-parse", "HEAD"],
+                            capture_output=True, text=True, check=False)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def sync_repo(repo_url, repo_path):
+    """
+    Clone repo_url into repo_path on the first run and fast-forward it afterwards.
+    Untracked files (the generated tests/) survive the update.
+    """
+    try:
+        if os.path.isdir(os.path.join(repo_path, ".git")):
+            subprocess.run(["git", "-C", repo_path, "pull", "--ff-only"], check=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(repo_path)), exist_ok=True)
+            subprocess.run(["git", "clone", repo_url, repo_path], check=True)
+        return repo_path
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Error while syncing repo: {e}")
+        return None
+
+
+def hash_source(source):
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+class AnalysisManifest:
+    """
+    Per-function source hashes and generated test files from the previous run.
+
+    Layout: {"commit": sha, "files": {rel_path: {"functions": {qualname: hash}, "tests": {qualname: [test files]}}},
+    "pending": {rel_path: [qualname]}}
+
+    "pending" holds the functions selected by a run that got no accepted tests
+    (LLM errors, empty responses, the prompt caps, rejected tests); they are
+    selected again by the next run even when neither they nor their file changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.commit = None
+        self.files = {}
+        self.pending = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.commit = data.get("commit")
+            self.files = data.get("files", {})
+            self.pending = data.get("pending", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"commit": self.commit, "files": self.files, "pending": self.pending}, f, indent=2)
+
+    def changed_paths(self, repo_path, head):
+        """
+        Python files touched between the recorded commit and head, or None when
+        there is no usable previous commit and everything has to be analyzed.
+        """
+        if not self.commit or not head:
+            return None
+        # A rename has to list the old path too, so select_changed drops the tests of its functions
+        result = subprocess.run(["git", "-C", repo_path, "diff", "--name-only", "--no-renames", self.commit, head],
+                                capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            return None
+        changed = [p for p in result.stdout.splitlines() if p.endswith(".py")]
+        # Files still holding functions without tests from an earlier run
+        changed += [p for p in self.pending if p not in changed]
+        return [os.path.join(repo_path, p) for p in changed]
+
+    def select_changed(self, code_results, repo_path, changed_paths=None):
+        """
+        Narrow code_results to functions that were added, whose source changed or
+        that are still pending from an earlier run; all of them become pending
+        until record() stores their tests.
+
+        Tests of functions that disappeared (removed functions, deleted files) are
+        deleted from tests/ and dropped from the manifest.
+        """
+        selected = {}
+        pending = {}
+
+        if changed_paths is not None:
+            for path in changed_paths:
+                rel_path = os.path.relpath(path, repo_path)
+                if not os.path.exists(path) and rel_path in self.files:
+                    self._remove_tests(repo_path, self.files.pop(rel_path).get("tests", {}))
+
+        for file_path, data in code_results.items():
+            if "functions" not in data:
+                continue
+            rel_path = os.path.relpath(file_path, repo_path)
+            entry = self.files.setdefault(rel_path, {"functions": {}, "tests": {}})
+
+            hashes = {}
+            for function_name in data["functions"]:
+                symbol = find_symbol(data, function_name)
+                if symbol:
+                    hashes[function_name] = hash_source(symbol["source"])
+
+            retry = set(self.pending.get(rel_path, []))
+            changed = [name for name, digest in hashes.items()
+                       if entry["functions"].get(name) != digest or name in retry]
+            removed = {name: tests for name, tests in entry["tests"].items() if name not in hashes}
+            self._remove_tests(repo_path, removed)
+
+            entry["functions"] = {name: digest for name, digest in entry["functions"].items() if name in hashes}
+            entry["tests"] = {name: tests for name, tests in entry["tests"].items() if name in hashes}
+            if changed:
+                selected[file_path] = {**data, "functions": changed, "hashes": hashes}
+                pending[rel_path] = changed
+
+        # Pending functions of files this run did not analyze stay pending
+        analyzed = {os.path.relpath(file_path, repo_path) for file_path, data in code_results.items()
+                    if "functions" in data}
+        for rel_path, names in self.pending.items():
+            if rel_path not in analyzed and os.path.exists(os.path.join(repo_path, rel_path)):
+                pending[rel_path] = names
+        self.pending = pending
+        return selected
+
+    def record(self, repo_path, file_path, function_name, digest, test_paths):
+        """
+        Store the source hash of a regenerated function and replace its old tests.
+        """
+        rel_path = os.path.relpath(file_path, repo_path)
+        entry = self.files.setdefault(rel_path, {"functions": {}, "tests": {}})
+        new_tests = [os.path.relpath(p, repo_path) for p in test_paths]
+        stale = [t for t in entry["tests"].get(function_name, []) if t not in new_tests]
+        self._remove_tests(repo_path, {function_name: stale})
+        entry["functions"][function_name] = digest
+        entry["tests"][function_name] = new_tests
+        if function_name in self.pending.get(rel_path, []):
+            self.pending[rel_path] = [name for name in self.pending[rel_path] if name != function_name]
+            if not self.pending[rel_path]:
+                del self.pending[rel_path]
+
+    @staticmethod
+    def _remove_tests(repo_path, tests_by_function):
+        for tests in tests_by_function.values():
+            for test in tests:
+                test_path = os.path.join(repo_path, test)
+                if os.path.exists(test_path):
+                    os.remove(test_path)
@@ -0,0 +1,269 @@
+import abc
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from code_rewriter import CODE_BLOCK_PATTERN
+from context_builder import estimate_tokens
+from metrics import METRICS
+from prompt_batcher import DELIMITER
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("ollama", "fake")
+
+DEFAULT_MODEL = "codellama:latest"
+
+
+class BackendError(Exception):
+    pass
+
+
+class LLMBackend(abc.ABC):
+    """
+    What the pipeline needs from a model: blocking and async generate, a token
+    stream, and token accounting.
+
+    Subclasses implement _generate (and generate_stream if they can stream). This
+    class adds the response cache, metrics, per-client token usage and optional
+    recording of every answered prompt to a JSONL file, which FakeBackend can replay.
+    """
+
+    # Exceptions of a failed request; they are logged and the prompt gets None
+    errors = (BackendError,)
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache=None, stream=False, record_path=None):
+        self.model_name = model_name
+        self.cache = cache
+        self.stream = stream
+        self.record_path = record_path
+        self.stream_stats = []
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "stopped_early_tokens": 0}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _generate(self, prompt, temperature, max_tokens):
+        """
+        Answer one prompt with a blocking request.
+        """
+
+    async def _agenerate(self, prompt, temperature, max_tokens):
+        return await asyncio.to_thread(self._generate, prompt, temperature, max_tokens)
+
+    def generate_stream(self, prompt, temperature=0.2, max_tokens=None, stop_at_code_block=True):
+        """
+        Yield the response in chunks. Backends without streaming yield it whole.
+        """
+        yield self._generate(prompt, temperature, max_tokens)
+
+    def _lookup(self, prompt, temperature, max_tokens):
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(self.model_name, prompt, temperature, max_tokens or None)
+        cached = self.cache.get(key)
+        METRICS.inc("cache_hits" if cached is not None else "cache_misses")
+        return key, cached
+
+    def _finish(self, key, prompt, text, start):
+        METRICS.observe("llm_request_seconds", time.perf_counter() - start)
+        text = (text or "").strip()
+        if key is not None and text:
+            self.cache.put(key, text)
+        if self.record_path and text:
+            with self._lock, open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"model": self.model_name, "prompt": prompt, "response": text}) + "\n")
+        return text
+
+    def _failed(self, error):
+        METRICS.inc("llm_errors")
+        logger.error(f"Error communicating with {type(self).__name__} ({self.model_name}): {error}")
+        return None
+
+    def generate(self, prompt, temperature=0.2, max_tokens=None):
+        key, cached = self._lookup(prompt, temperature, max_tokens)
+        if cached is not None:
+            return cached
+
+        METRICS.inc("llm_requests")
+        start = time.perf_counter()
+        try:
+            if self.stream:
+                # A batched prompt asks for one code block per function, so it must not stop at the first
+                text = "".join(self.generate_stream(prompt, temperature, max_tokens,
+                                                    stop_at_code_block=DELIMITER not in prompt))
+            else:
+                text = self._generate(prompt, temperature, max_tokens)
+        except self.errors as e:
+            return self._failed(e)
+        return self._finish(key, prompt, text, start)
+
+    async def agenerate(self, prompt, temperature=0.2, max_tokens=None):
+        key, cached = self._lookup(prompt, temperature, max_tokens)
+        if cached is not None:
+            return cached
+
+        METRICS.inc("llm_requests")
+        start = time.perf_counter()
+        try:
+            text = await self._agenerate(prompt, temperature, max_tokens)
+        except self.errors as e:
+            return self._failed(e)
+        return self._finish(key, prompt, text, start)
+
+    def record_usage(self, prompt_tokens, completion_tokens, prompt_seconds=0.0, eval_seconds=0.0, load_seconds=0.0):
+        """
+        Account one completed request, both on this client and in METRICS.
+        """
+        with self._lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+        METRICS.inc("llm_prompt_tokens", prompt_tokens)
+        METRICS.inc("llm_completion_tokens", completion_tokens)
+        METRICS.inc("llm_prompt_eval_seconds", prompt_seconds)
+        METRICS.inc("llm_eval_seconds", eval_seconds)
+        METRICS.inc("llm_load_seconds", load_seconds)
+
+    def record_stopped_stream(self, streamed_tokens):
+        """
+        Account the tokens of a stream cancelled before its final counts arrived.
+        They are kept apart from the completed requests, whose tokens and timings
+        alone make up the throughput ratios.
+        """
+        with self._lock:
+            self.usage["stopped_early_tokens"] += streamed_tokens
+        METRICS.inc("llm_stopped_early_tokens", streamed_tokens)
+
+    def _finish_stream(self, stats, first_token_at):
+        if first_token_at is not None:
+            elapsed = time.perf_counter() - first_token_at
+            stats["tokens_per_sec"] = round(stats["tokens"] / elapsed, 1) if elapsed > 0 else None
+        self.stream_stats.append(stats)
+        if stats["ttft"] is not None:
+            METRICS.observe("llm_ttft_seconds", stats["ttft"])
+        if stats["stopped_early"]:
+            METRICS.inc("llm_streams_stopped_early")
+
+
+FUNCTION_PATTERN = re.compile(r"^#{1,2} Function: (\S+)", re.MULTILINE)
+FILE_PATTERN = re.compile(r"^# File: (.+)$", re.MULTILINE)
+
+# {function} is the qualified name ("Class.method"), {test_name} the same as an identifier
+DEFAULT_TEMPLATE = """```python
+def test_{test_name}_is_defined():
+    assert {function} is not None
+```"""
+
+
+def _normalize_prompt(prompt):
+    # Prompts name the file by its path in a temporary clone, which differs between runs
+    return FILE_PATTERN.sub(lambda m: f"# File: {os.path.basename(m.group(1).strip())}", prompt)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic offline backend for benchmarks and pipeline regression runs.
+
+    Prompts recorded with record_path (by any backend) are answered with the
+    recorded response; all others get template, formatted with the function named
+    in the prompt (one delimited section per function for batched prompts). The
+    latency of a model is simulated as ttft seconds plus the response length at
+    tokens_per_sec, varied by up to +/- jitter; the variation depends only on the
+    prompt and seed, so runs are repeatable.
+    """
+
+    def __init__(self, replay_path=None, template=DEFAULT_TEMPLATE, ttft=0.0, tokens_per_sec=None, jitter=0.0,
+                 seed=0, model_name="fake", **kwargs):
+        super().__init__(model_name=model_name, **kwargs)
+        self.template = template
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter = jitter
+        self.seed = seed
+        self.recorded = {}
+        if replay_path:
+            with open(replay_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded[_normalize_prompt(entry["prompt"])] = entry["response"]
+            logger.info(f"Replaying {len(self.recorded)} recorded responses from {replay_path}")
+
+    def respond(self, prompt):
+        recorded = self.recorded.get(_normalize_prompt(prompt))
+        if recorded is not None:
+            METRICS.inc("fake_replayed")
+            return recorded
+        names = FUNCTION_PATTERN.findall(prompt) or ["target"]
+        if len(names) == 1:
+            return self._format(names[0])
+        return "\n\n".join(f"{DELIMITER} {name}\n{self._format(name)}" for name in names)
+
+    def _format(self, name):
+        return self.template.format(function=name, test_name=name.replace(".", "_"))
+
+    def _timing(self, prompt, text):
+        scale = 1 + random.Random(f"{self.seed}:{prompt}").uniform(-self.jitter, self.jitter)
+        decode = estimate_tokens(text) / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        return self.ttft * scale, decode * scale
+
+    def _answer(self, prompt):
+        text = self.respond(prompt)
+        ttft, decode = self._timing(prompt, text)
+        self.record_usage(estimate_tokens(prompt), estimate_tokens(text), prompt_seconds=ttft, eval_seconds=decode)
+        return text, ttft + decode
+
+    def _generate(self, prompt, temperature, max_tokens):
+        text, delay = self._answer(prompt)
+        time.sleep(delay)
+        return text
+
+    async def _agenerate(self, prompt, temperature, max_tokens):
+        text, delay = self._answer(prompt)
+        await asyncio.sleep(delay)
+        return text
+
+    def generate_stream(self, prompt, temperature=0.2, max_tokens=None, stop_at_code_block=True):
+        text = self.respond(prompt)
+        ttft, decode = self._timing(prompt, text)
+        chunks = re.findall(r"\s*\S+", text) or [text]
+        stats = {"ttft": None, "tokens": 0, "tokens_per_sec": None, "stopped_early": False}
+        start = time.perf_counter()
+        time.sleep(ttft)
+        first_token_at = time.perf_counter()
+        stats["ttft"] = round(first_token_at - start, 3)
+        received = []
+        try:
+            for i, chunk in enumerate(chunks):
+                stats["tokens"] += 1
+                received.append(chunk)
+                yield chunk
+                if stop_at_code_block and "`" in chunk and CODE_BLOCK_PATTERN.search("".join(received)):
+                    stats["stopped_early"] = i < len(chunks) - 1
+                    break
+                time.sleep(decode / len(chunks))
+        finally:
+            if stats["stopped_early"]:
+                self.record_stopped_stream(stats["tokens"])
+            else:
+                self.record_usage(estimate_tokens(prompt), estimate_tokens(text), prompt_seconds=ttft,
+                                  eval_seconds=decode)
+            self._finish_stream(stats, first_token_at)
+
+
+def create_backend(name="ollama", concurrency=4, **options):
+    """
+    Build the LLM backend called `name` (one of BACKENDS). Ollama's client is
+    imported only here, since requests dominates startup otherwise.
+    """
+    if name == "fake":
+        return FakeBackend(**options)
+    if name == "ollama":
+        from ollama_client import OllamaClient
+        return OllamaClient(pool_size=concurrency, **options)
+    raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
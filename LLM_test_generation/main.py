@@ -1,188 +1,627 @@
-from code_analyzer import CodeAnalyzer
-from clone_github_repo import clone_github_repo
+import time
+_IMPORT_START = time.perf_counter()
+
+from code_analyzer import CodeAnalyzer, find_symbol
+from clone_github_repo import CloneManager, DEFAULT_MIRROR_DIR
 from doc_reader import DocReader
 from prompt_generator import PromptGenerator
-from coverage_analyzer import CoverageAnalyzer
 from fuzz_test_generator import FuzzTestGenerator
-import shutil
+import glob
 import os
-import stat
 import argparse
-from ollama_client import OllamaClient
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from generation_engine import GenerationEngine
+from llm_backend import BACKENDS, DEFAULT_MODEL, create_backend
+from response_cache import ResponseCache, DEFAULT_CACHE_PATH
+from analysis_cache import AnalysisCache, DEFAULT_ANALYSIS_CACHE_PATH
+from incremental import AnalysisManifest, git_head, sync_repo
+from coverage_guided import run_coverage_guided
+from coverage_map import CoverageMap
+from testgen_plugins.fuzz_profiles import DEFAULT_EXAMPLE_DB, DEFAULT_PROFILE, PROFILES, FuzzSettings
+from validation import TestValidator
+from repair import TestRepairer, SYNTAX_ERROR_MARKER
+from prompt_batcher import PromptBatcher
+from context_builder import estimate_tokens
+from metrics import METRICS, timed
+from dedup import TestDeduplicator
+from code_rewriter import extract_code_block, rewrite_test_code, split_test_functions
 import re
 import ast
-def extract_code_block(response: str) -> str:
-    match = re.search(r"```(?:python)?(.*?)```", response, re.DOTALL)
-    return match.group(1).strip() if match else response.strip()
+# ollama_client (requests, via create_backend) and coverage_analyzer (coverage, pytest) are imported
+# by the stages that need them; they dominate CLI startup otherwise.
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Import and init time per pipeline stage, reported with --profile-startup.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.timings.append((name, time.perf_counter() - start))
+
+    def report(self):
+        if not self.enabled:
+            return
+        logger.info("\n --- Startup profile ---")
+        for name, seconds in self.timings:
+            logger.info(f"  {name:<40} {seconds * 1000:9.1f} ms")
+
+
 def is_valid_python(code: str) -> bool:
     try:
         ast.parse(code)
         return True
     except SyntaxError:
         return False
-def handle_remove_readonly(func, path, _):
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
-def ensure_pytest_import(code: str) -> str:
-    if "pytest." in code or "@pytest." in code:
-        if "import pytest" not in code:
-            return "import pytest\n\n" + code
-    return code
-def fix_hypothesis_settings(code: str) -> str:
-    pattern = r"with\s+hypothesis\.settings\((.*?)\):"
-    return re.sub(pattern, r"@hypothesis.settings(\1)\n", code)
-def ensure_hypothesis_imports(code: str) -> str:
-    lines = code.strip().splitlines()
-    needed_imports = []
-
-    if "@given" in code or "st." in code:
-        if "from hypothesis import given" not in code:
-            needed_imports.append("from hypothesis import given, strategies as st")
-
-    if "@hypothesis.settings" in code or "hypothesis.settings" in code:
-        if "import hypothesis" not in code:
-            needed_imports.append("import hypothesis")
-
-    if "pytest." in code or "pytest.raises" in code:
-        if "import pytest" not in code:
-            needed_imports.append("import pytest")
-
-    return "\n".join(needed_imports + [""] + lines)
-def fix_common_import_mistakes(code: str) -> str:
-    # LLM często myli lokalne moduły z `sklearn` lub `spin`
-    fixed = code
-    fixed = fixed.replace("from sklearn import util", "from . import util")
-    fixed = fixed.replace("from spin import util", "from . import util")
-    return fixed
-def auto_add_function_import(code: str, function_name: str, file_path: str) -> str:
+
+
+def postprocess_test_code(code, p, repo_path=None):
     """
-    Dodaje brakujący import do funkcji, jeśli nie występuje.
-    Zakłada, że testy i kod źródłowy są w tym samym repozytorium.
+    Extract the code block of one LLM response and fix its imports/settings.
     """
-    base_module = os.path.basename(file_path).replace(".py", "")
-    import_line = f"""
-import sys, os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from {base_module} import {function_name}
-"""
-
-    lines = code.splitlines()
-    lines = [l for l in lines if not (
-        l.strip().startswith("from ") and function_name in l and "import" in l
-    )]
-
-    if function_name in code and import_line not in code:
-        lines.insert(0, import_line)
-
-    return "\n".join(lines)
-def split_into_test_functions(code: str) -> list[str]:
+    tests_dir = os.path.join(repo_path, "tests") if repo_path else None
+    return rewrite_test_code(extract_code_block(code), p['function'], p['file'], tests_dir)
+
+
+def generated_test_stem(file_path, function_name, repo_path):
     """
-    Splits a code block into multiple test functions (or top-level code blocks).
+    test_<module path>__<qualified name>, e.g. test_pkg__io__Reader__run: one name per
+    symbol, so the tests of same-named functions and methods never overwrite each other.
     """
-    blocks = []
-    current = []
-    lines = code.splitlines()
-    for line in lines:
-        if line.strip().startswith("def test_") and current:
-            blocks.append("\n".join(current))
-            current = []
-        current.append(line)
-    if current:
-        blocks.append("\n".join(current))
-    return blocks
-def analyze_github_repo(repo_url, test_type="unit"):
-    global test_file_name
-    repo_path = clone_github_repo(repo_url)
-    if not repo_path:
-        return
-
-    analyzer = CodeAnalyzer(repo_path)
-    code_results = analyzer.analyze()
+    module = os.path.splitext(os.path.relpath(file_path, repo_path))[0]
+    parts = module.split(os.sep) + function_name.split(".")
+    return "test_" + "__".join(re.sub(r"\W", "_", part) for part in parts)
 
-    doc_reader = DocReader(repo_path)
-    docs = doc_reader.read_docs()
 
-    print("\n --- Generated test prompts ---\n")
-    os.makedirs(os.path.join(repo_path, "tests"), exist_ok=True)
+def write_generated_tests(p, response, repo_path, test_type, deduplicator=None):
+    """
+    Post-process one LLM response and write it under tests/. Returns the written paths.
+    With a TestDeduplicator, tests structurally identical to earlier ones are not written.
+    """
+    written = []
+    code = postprocess_test_code(response, p, repo_path)
+    stem = generated_test_stem(p['file'], p['function'], repo_path)
+    if test_type == 'fuzz':
+        snippets = split_test_functions(code)
+        for j, snippet in enumerate(snippets):
+            test_file_name = f"{stem}_{j}.py"
+            test_file_path = os.path.join(repo_path, "tests", test_file_name)
+            if deduplicator is not None:
+                snippet = deduplicator.filter_source(snippet)
+                if snippet is None:
+                    continue
+            with open(test_file_path, "w", encoding="utf-8") as f:
+                f.write(snippet)
+            written.append(test_file_path)
+        if written:
+            # The new response may split into fewer files: once it replaced the previous one, drop the
+            # files past its last test (files of tests skipped as duplicates still hold an equivalent test)
+            for old_file in glob.glob(glob.escape(os.path.join(repo_path, "tests", stem)) + "_*.py"):
+                index = re.fullmatch(r"_(\d+)\.py", os.path.basename(old_file)[len(stem):])
+                if index and int(index.group(1)) >= len(snippets):
+                    os.remove(old_file)
 
-    if test_type == "fuzz":
-        llm_client = OllamaClient(model_name="codellama:latest")
-        generator = FuzzTestGenerator(analyzer.extract_function_code, llm_client)
-        prompts = generator.generate_tests_for_functions(code_results, max_files=1)
-        use_response_directly = True
     else:
-        generator = PromptGenerator(analyzer.extract_function_code)
-        prompts = generator.generate_batch_prompts(code_results, docs, test_type)
-        use_response_directly = False
-
-    for i, p in enumerate(prompts):
-        if i >= 1:
-            break
-        print(f"File: {p['file']} - Function: {p['function']}")
-        print(f"Prompt:\n{p['prompt']}")
-        print("=" * 60)
-
-        response = p["response"] if use_response_directly else send_prompt_to_ollama(p["prompt"])
-        if test_type =='fuzz':
-            print_prompt_and_response(response)
-
-        code = extract_code_block(response)
-        if test_type == 'fuzz':
-            for j, snippet in enumerate(split_into_test_functions(code)):
-                test_file_name = f"test_{p['function']}_{i}_{j}.py"
-                test_file_path = os.path.join(repo_path, "tests", test_file_name)
-                code1 = extract_code_block(snippet)
-                code1 = ensure_pytest_import(code1)
-                code1 = fix_common_import_mistakes(code1)
-                code1 = ensure_hypothesis_imports(code1)
-                code1 = auto_add_function_import(code1, p['function'], p['file'])
-                snippet = fix_hypothesis_settings(code1)
-                with open(test_file_path, "w", encoding="utf-8") as f:
-                    f.write(snippet)
+        test_file_name = f"{stem}.py"
+        test_file_path = os.path.join(repo_path, "tests", test_file_name)
 
+        if is_valid_python(code):
+            if deduplicator is not None:
+                code = deduplicator.filter_source(code)
+                if code is None:
+                    return written
+            with open(test_file_path, "w", encoding="utf-8") as f:
+                f.write(code)
         else:
+            logger.warning("Syntax error in generated code. Not saving.")
+            with open(test_file_path, "w", encoding="utf-8") as f:
+                f.write(SYNTAX_ERROR_MARKER + code)
+        written.append(test_file_path)
+    return written
 
-            code = ensure_pytest_import(code)
-            code = fix_common_import_mistakes(code)
-            code = auto_add_function_import(code, p['function'], p['file'])
-            test_file_name = f"test_{p['function']}_{i}.py"
-            test_file_path = os.path.join(repo_path, "tests", test_file_name)
 
-            if is_valid_python(code):
-                with open(test_file_path, "w", encoding="utf-8") as f:
-                    f.write(code)
+class RepoRun:
+    """
+    One repository going through the pipeline stages: clone, analyze, generate and coverage.
+
+    analyze_github_repo runs the stages back to back; BatchRunner overlaps them across
+    repositories and shares one LLM client and response cache between them. A stage
+    returns False when there is nothing left to do for the repository.
+    """
+
+    def __init__(self, repo_url, test_type="unit", concurrency=4, cache=None, state_dir=None, stream=False,
+                 coverage_guided=False, token_budget=None, time_budget=None, in_process_coverage=False,
+                 validate=False, test_timeout=60, memory_limit_mb=1024, repair_attempts=0,
+                 repair_token_budget=4000, prompt_token_budget=None, profile=None, workers=1,
+                 llm_client=None, engine=None, clone_manager=None, batcher=None, dedup=False, backend="ollama",
+                 backend_options=None, analysis_cache=None, fuzz_settings=None):
+        self.repo_url = repo_url
+        self.test_type = test_type
+        self.concurrency = concurrency
+        self.cache = cache
+        self.state_dir = state_dir
+        self.stream = stream
+        self.coverage_guided = coverage_guided
+        self.token_budget = token_budget
+        self.time_budget = time_budget
+        self.in_process_coverage = in_process_coverage
+        self.validate = validate
+        self.test_timeout = test_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.repair_attempts = repair_attempts
+        self.repair_token_budget = repair_token_budget
+        self.prompt_token_budget = prompt_token_budget
+        self.profile = profile or StartupProfile()
+        self.workers = workers
+        self.llm_client = llm_client
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.engine = engine
+        self.clone_manager = clone_manager or CloneManager()
+        self.batcher = batcher
+        self.dedup = dedup
+        self.deduplicator = None
+        self.analysis_cache = analysis_cache
+        self.fuzz_settings = fuzz_settings or FuzzSettings()
+
+        self.repo_path = None
+        self.manifest = None
+        self.coverage_map = None
+        self.code_results = {}
+        self.prompts = []
+        self.written_tests = []
+        # (prompt, written test files) of every response, validated or not
+        self.generated = []
+        self.affected_tests = []
+        self.coverage_results = {}
+        self.repairer = None
+        self.token_usage = {}
+        self.fuzz_timings = {}
+
+    def _client(self):
+        if self.llm_client is None:
+            with self.profile.stage(f"init {self.backend} backend"):
+                self.llm_client = create_backend(self.backend, concurrency=self.concurrency, cache=self.cache,
+                                                 stream=self.stream, **self.backend_options)
+        if self.engine is None:
+            self.engine = GenerationEngine(self.llm_client, max_concurrency=self.concurrency)
+        return self.llm_client
+
+    @timed("clone")
+    def clone(self):
+        if self.state_dir:
+            self.repo_path = sync_repo(self.repo_url, os.path.join(self.state_dir, "repo"))
+        else:
+            self.repo_path = self.clone_manager.clone(self.repo_url)
+        if not self.repo_path:
+            raise RuntimeError(f"Could not clone {self.repo_url}")
+        return True
+
+    @timed("analyze")
+    def analyze(self):
+        """
+        Parse sources and docs and build the prompts.
+        """
+        with self.profile.stage("init CodeAnalyzer"):
+            self.analyzer = CodeAnalyzer(self.repo_path, workers=self.workers, cache=self.analysis_cache)
+        if self.state_dir:
+            self.manifest = AnalysisManifest(os.path.join(self.state_dir, "manifest.json"))
+            self.coverage_map = CoverageMap(os.path.join(self.state_dir, "coverage_map.json"), self.repo_path,
+                                            analyzer=self.analyzer)
+            head = git_head(self.repo_path)
+            changed_paths = self.manifest.changed_paths(self.repo_path, head)
+            with METRICS.stage("analyze.parse"):
+                if changed_paths is None:
+                    code_results = self.analyzer.analyze()
+                else:
+                    code_results = self.analyzer.analyze_files(changed_paths)
+            self.code_results = self.manifest.select_changed(code_results, self.repo_path, changed_paths)
+            # Selected functions stay pending in the manifest until they get accepted tests,
+            # so the commit can advance even if this run leaves some of them without tests
+            self.manifest.commit = head
+            logger.info(f"Incremental run: {sum(len(d.get('functions', [])) for d in self.code_results.values())} "
+                        f"functions added or changed")
+            if not self.code_results:
+                self.manifest.save()
+                return False
+        else:
+            with METRICS.stage("analyze.parse"):
+                self.code_results = self.analyzer.analyze()
+
+        with self.profile.stage("init DocReader"):
+            doc_reader = DocReader(self.repo_path, workers=self.workers, cache=self.analysis_cache)
+        with METRICS.stage("analyze.docs"):
+            docs = doc_reader.read_docs()
+
+        logger.info("\n --- Generated test prompts ---\n")
+        os.makedirs(os.path.join(self.repo_path, "tests"), exist_ok=True)
+
+        llm_client = self._client()
+        with METRICS.stage("analyze.prompts"):
+            # Coverage-guided runs rank every function, so the file caps only apply to plain runs
+            if self.test_type == "fuzz":
+                self.generator = FuzzTestGenerator(self.analyzer.extract_function_code, llm_client, self.engine)
+                self.prompts = self.generator.build_prompts(self.code_results,
+                                                            max_files=None if self.coverage_guided else 1)
             else:
-                print("Syntax error in generated code. Not saving.")
-                with open(test_file_path, "w", encoding="utf-8") as f:
-                    f.write("# Syntax error in generated code\n" + code)
+                self.generator = PromptGenerator(self.analyzer.extract_function_code,
+                                                 token_budget=self.prompt_token_budget)
+                self.prompts = self.generator.generate_batch_prompts(self.code_results, docs, self.test_type,
+                                                                     max_files=None if self.coverage_guided else 10,
+                                                                     doc_index=doc_reader.index)
+        # Prompts hold copies of the sections they use; unmap the doc files before the clone is removed
+        doc_reader.close()
+        METRICS.inc("prompts", len(self.prompts))
+        return True
+
+    def _handle_response(self, p, response):
+        if response and self.test_type == "fuzz":
+            response = self.generator.auto_append_assertion(response, p["function"])
+        logger.info(f"File: {p['file']} - Function: {p['function']}")
+        logger.info(f"Prompt:\n{p['prompt']}")
+        logger.info("=" * 60)
+        print_prompt_and_response(response, prompt_text=p["prompt"])
+        if not response:
+            return []
+
+        prompt_tests = write_generated_tests(p, response, self.repo_path, self.test_type, self.deduplicator)
+        METRICS.inc("tests_written", len(prompt_tests))
+        if self.repairer is not None:
+            self.repairer.track(prompt_tests, p)
+        self.generated.append((p, prompt_tests))
+        return prompt_tests
+
+    def _record_accepted(self):
+        """
+        Record the functions that got accepted tests in the manifest; the others
+        stay pending there and are generated again by the next run.
+        """
+        if self.manifest is None:
+            return
+        accepted = set(self.written_tests)
+        for p, prompt_tests in self.generated:
+            prompt_tests = [t for t in prompt_tests if t in accepted]
+            if prompt_tests:
+                digest = self.code_results[p["file"]]["hashes"][p["function"]]
+                self.manifest.record(self.repo_path, p["file"], p["function"], digest, prompt_tests)
+
+    def _coverage_analyzer(self, timings_path=None):
+        with self.profile.stage("import coverage_analyzer"):
+            from coverage_analyzer import CoverageAnalyzer
+        # Report and data file per repository: batch stages of different repositories run concurrently
+        return CoverageAnalyzer(test_dir=os.path.join(self.repo_path, "tests"), source_dir=self.repo_path,
+                                report_file=os.path.join(self.repo_path, "coverage.json"),
+                                in_process=self.in_process_coverage, coverage_map=self.coverage_map,
+                                pytest_args=self.fuzz_settings.pytest_args(timings_path))
 
-    # --- Coverage analysis ---
-    coverage_analyzer = CoverageAnalyzer(test_dir=os.path.join(repo_path, "tests"), source_dir=repo_path)
-    coverage_analyzer.run_coverage()
-    coverage_results = coverage_analyzer.parse_coverage()
+    def _affected_tests(self):
+        """
+        Tests of earlier runs that ran a function changed since, according to the coverage map.
+        """
+        if self.coverage_map is None:
+            return []
+        changed = []
+        for file_path, data in self.code_results.items():
+            for function_name in data.get("functions", []):
+                symbol = find_symbol(data, function_name)
+                if symbol:
+                    changed.append((file_path, symbol["qualname"]))
+        written = set(self.written_tests)
+        # Tests regenerated for a changed function have already replaced their old files
+        return [test_path for test_path in self.coverage_map.tests_covering(changed)
+                if test_path not in written and os.path.exists(test_path)]
 
-    print("\n --- Coverage Results ---")
-    for file, funcs in coverage_results.items():
-        print(f"File: {file}")
-        for func, cov in funcs.items():
-            print(f"  {func}: {cov}%")
-        print("-" * 40)
+    @timed("generate")
+    def generate(self):
+        """
+        Send the prompts to the LLM, write the tests and validate/repair them if asked to.
+        """
+        llm_client = self._client()
+        if self.dedup:
+            self.deduplicator = TestDeduplicator(os.path.join(self.repo_path, "redundant_tests"))
+        validator = None
+        if self.validate or self.repair_attempts > 0:
+            validator = TestValidator(self.repo_path, timeout=self.test_timeout,
+                                      memory_limit_mb=self.memory_limit_mb,
+                                      pytest_args=self.fuzz_settings.pytest_args())
+        if self.repair_attempts > 0:
+            self.repairer = TestRepairer(llm_client, validator,
+                                         lambda code, p: postprocess_test_code(code, p, self.repo_path),
+                                         max_attempts=self.repair_attempts, token_budget=self.repair_token_budget)
+            # The repairer validates too, and retries what fails before rejecting it
+            validator = self.repairer
+
+        if self.coverage_guided:
+            with _coverage_lock(self.in_process_coverage):
+                self.written_tests = run_coverage_guided(self.prompts, self.code_results, self.engine,
+                                                         self._coverage_analyzer(), self._handle_response,
+                                                         token_budget=self.token_budget,
+                                                         time_budget=self.time_budget, validator=validator)
+            self.written_tests = [t for t in dict.fromkeys(self.written_tests) if os.path.exists(t)]
+        else:
+            with METRICS.stage("generate.llm"):
+                if self.batcher is not None:
+                    responses = self.batcher.generate_all(self.engine, self.prompts, self.code_results,
+                                                          self.test_type)
+                else:
+                    responses = self.engine.generate_all(p["prompt"] for p in self.prompts)
+            self.written_tests = []
+            with METRICS.stage("generate.write"):
+                for p, response in zip(self.prompts, responses):
+                    self.written_tests.extend(self._handle_response(p, response))
+                # A later response for the same symbol may have rewritten or removed earlier files
+                self.written_tests = [t for t in dict.fromkeys(self.written_tests) if os.path.exists(t)]
+            self._report_token_usage(responses)
+            if validator is not None:
+                with METRICS.stage("generate.validate"):
+                    self.written_tests = validator.accepted(self.written_tests)
+        self._record_accepted()
+        if self.deduplicator is not None:
+            with METRICS.stage("generate.prune"):
+                self._prune_redundant_tests()
+        METRICS.inc("tests_accepted", len(self.written_tests))
+
+        self.affected_tests = self._affected_tests()
+        if self.affected_tests:
+            logger.info(f"{len(self.affected_tests)} earlier tests run changed functions")
+            if validator is not None:
+                with METRICS.stage("generate.revalidate"):
+                    self.affected_tests = validator.accepted(self.affected_tests)
+
+        if self.manifest is not None:
+            self.manifest.save()
+            if not self.written_tests and not self.affected_tests:
+                logger.info("No tests regenerated, skipping coverage.")
+                return False
+        return True
+
+    def _prune_redundant_tests(self):
+        """
+        Measure per-test-file coverage and drop the files that add no lines.
+
+        The new tests run in a coverage subprocess unless in-process coverage was
+        asked for, so an unvalidated test that hangs or exits cannot take the run down.
+        """
+        METRICS.inc("tests_duplicate", self.deduplicator.duplicates)
+        if len(self.written_tests) < 2:
+            return
+        coverage_analyzer = self._coverage_analyzer()
+        # Only the per-test lines are needed here; the coverage map is refreshed by the coverage stage
+        coverage_analyzer.coverage_map = None
+        with _coverage_lock(self.in_process_coverage):
+            coverage_analyzer.run_coverage(self.written_tests)
+        self.written_tests = self.deduplicator.prune(self.written_tests, coverage_analyzer.test_lines,
+                                                     test_dir=os.path.join(self.repo_path, "tests"))
+        METRICS.inc("tests_pruned", self.deduplicator.pruned)
+        logger.info(f"Dropped {self.deduplicator.duplicates} structurally duplicate tests and "
+                    f"{self.deduplicator.pruned} test files with redundant coverage")
+
+    def _report_token_usage(self, responses):
+        """
+        Estimated prompt + response tokens per written test file, comparable with and without batching.
+        """
+        if self.batcher is not None:
+            stats = self.batcher.report()
+            prompt_tokens, response_tokens = stats["prompt_tokens"], stats["response_tokens"]
+            logger.info(f"\nBatched {stats['functions']} small functions: {len(self.prompts)} prompts sent as "
+                        f"{stats['calls']} LLM calls ({stats['retried']} retried alone), prompt tokens "
+                        f"{stats['prompt_tokens_unbatched']} -> {prompt_tokens}")
+        else:
+            prompt_tokens = sum(estimate_tokens(p["prompt"]) for p in self.prompts)
+            response_tokens = sum(estimate_tokens(response or "") for response in responses)
+        tests = len(self.written_tests)
+        self.token_usage = {"prompt_tokens": prompt_tokens, "response_tokens": response_tokens, "tests": tests,
+                            "tokens_per_test": round((prompt_tokens + response_tokens) / tests, 1) if tests else None}
+        logger.info(f"Tokens per generated test (estimated): {self.token_usage['tokens_per_test']} over {tests} tests")
+
+    def _report_fuzz_timings(self, timings):
+        """
+        Time spent per property test in the coverage run, slowest first.
+        """
+        timings = sorted(timings, key=lambda t: -t["seconds"])
+        for timing in timings:
+            METRICS.observe("fuzz_property_seconds", timing["seconds"])
+        self.fuzz_timings = {
+            "properties": len(timings),
+            "seconds": round(sum(t["seconds"] for t in timings), 3),
+            "replay_only": sum(1 for t in timings if t["replay_only"]),
+            "slowest": timings[:5],
+        }
+        logger.info(f"\nProperty tests: {self.fuzz_timings['properties']} in {self.fuzz_timings['seconds']}s "
+                    f"(profile {self.fuzz_settings.profile}; {self.fuzz_timings['replay_only']} over the time "
+                    f"budget only replayed stored examples)")
+        for timing in timings[:5]:
+            logger.info(f"  {timing['seconds']:.2f}s {timing['test']} [{timing['outcome']}]")
+
+    @timed("coverage")
+    def coverage(self):
+        timings_path = os.path.join(self.repo_path, ".fuzz_timings.jsonl")
+        if os.path.exists(timings_path):
+            os.remove(timings_path)
+        coverage_analyzer = self._coverage_analyzer(timings_path)
+        # Incremental runs only re-measure the regenerated tests and the earlier ones that ran a
+        # changed function; the coverage map merges them with the stored lines of every other test.
+        # Until the map knows any test, the whole suite is measured once to fill it.
+        test_paths = None
+        if self.manifest is not None and self.coverage_map.tests:
+            test_paths = self.written_tests + self.affected_tests
+        with _coverage_lock(self.in_process_coverage):
+            coverage_analyzer.run_coverage(test_paths)
+            self.coverage_results = coverage_analyzer.parse_coverage(self.code_results)
+        if self.coverage_map is not None:
+            self.coverage_map.save()
+        timings = FuzzSettings.read_timings(timings_path)
+        if timings:
+            os.remove(timings_path)
+            self._report_fuzz_timings(timings)
+
+        logger.info("\n --- Coverage Results ---")
+        for file, funcs in self.coverage_results.items():
+            logger.info(f"File: {file}")
+            for func, cov in funcs.items():
+                logger.info(f"  {func}: {cov}%")
+            logger.info("-" * 40)
+        return True
+
+    def cleanup(self):
+        if self.repo_path and not self.state_dir:
+            self.clone_manager.release(self.repo_path)
+
+    def summary(self):
+        return {
+            "repo": self.repo_url,
+            "functions": sum(len(d.get("functions", [])) for d in self.code_results.values()),
+            "prompts": len(self.prompts),
+            "tests_written": len(self.written_tests),
+            "token_usage": self.token_usage,
+            "clone": self.clone_manager.stats.get(self.repo_path),
+            "coverage": self.coverage_results,
+            "fuzz": self.fuzz_timings,
+        }
+
+
+# In-process coverage measures this very interpreter, so only one repository may use it at a time
+_IN_PROCESS_COVERAGE_LOCK = threading.Lock()
+
+
+def _coverage_lock(in_process):
+    return _IN_PROCESS_COVERAGE_LOCK if in_process else nullcontext()
+
+
+def analyze_github_repo(repo_url, test_type="unit", concurrency=4, cache=None, state_dir=None, stream=False,
+                        coverage_guided=False, token_budget=None, time_budget=None, in_process_coverage=False,
+                        validate=False, test_timeout=60, memory_limit_mb=1024, repair_attempts=0,
+                        repair_token_budget=4000, prompt_token_budget=None, profile=None, workers=1,
+                        clone_manager=None, batcher=None, dedup=False, backend="ollama", backend_options=None,
+                        analysis_cache=None, fuzz_settings=None):
+    """
+    Generate tests for a repository. With state_dir the clone, the generated tests
+    and a manifest of function hashes are kept there between runs, and only
+    functions added or changed since the previous run are regenerated.
+
+    With coverage_guided, baseline coverage is measured first and functions are
+    generated least-covered first until token_budget or time_budget runs out.
+
+    With validate, every generated test file is run in its own sandboxed process
+    first and only passing files reach coverage. repair_attempts > 0 additionally
+    feeds failing files back to the LLM with their error (implies validate).
+
+    fuzz_settings (a FuzzSettings) sets the Hypothesis profile, example database
+    and time budget of every validation and coverage run.
+    """
+    run = RepoRun(repo_url, test_type, concurrency=concurrency, cache=cache, state_dir=state_dir, stream=stream,
+                  coverage_guided=coverage_guided, token_budget=token_budget, time_budget=time_budget,
+                  in_process_coverage=in_process_coverage, validate=validate, test_timeout=test_timeout,
+                  memory_limit_mb=memory_limit_mb, repair_attempts=repair_attempts,
+                  repair_token_budget=repair_token_budget, prompt_token_budget=prompt_token_budget,
+                  profile=profile, workers=workers, clone_manager=clone_manager, batcher=batcher, dedup=dedup,
+                  backend=backend, backend_options=backend_options, analysis_cache=analysis_cache,
+                  fuzz_settings=fuzz_settings)
+    try:
+        run.clone()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return
+    if not (run.analyze() and run.generate() and run.coverage()):
+        return
+
+    if cache is not None:
+        logger.info(f"\nLLM response cache: {cache.stats()}")
+    if analysis_cache is not None:
+        logger.info(f"Analysis cache: {analysis_cache.stats()}")
+    if run.repairer is not None:
+        logger.info(f"\nRepair success rate per attempt: {run.repairer.report()}")
+    if run.llm_client.stream_stats:
+        print_stream_stats(run.llm_client.stream_stats)
+
+    run.cleanup()
+
+def run_batch(repos, report_path="batch_report.json", cache=None, concurrency=4, stream=False, state_dir=None,
+              profile=None, **options):
+    """
+    Generate tests for many repositories, pipelining the stages across them: one
+    repository is cloned and analyzed while another's prompts are at the LLM.
+
+    All repositories share one LLM client (and so its connection pool and the
+    response cache). Writes a JSON report with per-stage timings for every repository.
+    """
+    from batch import BatchRunner
+    profile = profile or StartupProfile()
+    with profile.stage(f"init {options.get('backend', 'ollama')} backend"):
+        llm_client = create_backend(options.pop("backend", "ollama"), concurrency=concurrency, cache=cache,
+                                    stream=stream, **(options.pop("backend_options", None) or {}))
+    engine = GenerationEngine(llm_client, max_concurrency=concurrency)
+
+    # Every repository gets its own batcher so its token statistics stay separate
+    batcher = options.pop("batcher", None)
+    runs = []
+    for i, repo in enumerate(repos):
+        # Each repository keeps its incremental state in its own subdirectory
+        repo_state = os.path.join(state_dir, f"{i}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', repo)[-80:]}") if state_dir else None
+        runs.append(RepoRun(repo, concurrency=concurrency, cache=cache, state_dir=repo_state, stream=stream,
+                            profile=profile, llm_client=llm_client, engine=engine,
+                            batcher=PromptBatcher(batcher.token_budget, batcher.small_function_tokens,
+                                                  batcher.max_functions) if batcher else None, **options))
+
+    runner = BatchRunner([("clone", RepoRun.clone), ("analyze", RepoRun.analyze),
+                          ("generate", RepoRun.generate), ("coverage", RepoRun.coverage)],
+                         finalize=RepoRun.cleanup)
+    runner.run(runs, names=list(repos))
+    runner.write_report(report_path)
+
+    report = runner.report()
+    logger.info(f"\n --- Batch of {len(repos)} repositories ---")
+    for record in report["jobs"]:
+        stages = ", ".join(f"{name} {timing['seconds']:.1f}s" for name, timing in record["stages"].items())
+        logger.info(f"  [{record['status']}] {record['job']}: {stages}")
+    logger.info(f"Wall time {report['wall_time']:.1f}s vs {report['sequential_time']:.1f}s of stage time; "
+                f"report written to {report_path}")
+    if cache is not None:
+        logger.info(f"\nLLM response cache: {cache.stats()}")
+    if options.get("analysis_cache") is not None:
+        logger.info(f"Analysis cache: {options['analysis_cache'].stats()}")
+    return report
 
-    shutil.rmtree(repo_path, onerror=handle_remove_readonly)
 
 def print_prompt_and_response(model_response,prompt_text=" "):
-    print(f"Prompt length: {len(prompt_text)}")
-    print("=== Model Response ===")
+    logger.info(f"Prompt length: {len(prompt_text)}")
+    logger.info("=== Model Response ===")
     if model_response:
-        print(model_response)
+        logger.info(model_response)
     else:
-        print("No response generated.")
-    print("=" * 60)
+        logger.info("No response generated.")
+    logger.info("=" * 60)
 
 
-def send_prompt_to_ollama(prompt_text):
+def print_stream_stats(stream_stats):
+    ttfts = [s["ttft"] for s in stream_stats if s["ttft"] is not None]
+    rates = [s["tokens_per_sec"] for s in stream_stats if s["tokens_per_sec"] is not None]
+    stopped = sum(1 for s in stream_stats if s["stopped_early"])
+    logger.info(f"\nStreamed {len(stream_stats)} responses, {stopped} stopped after the first code block")
+    if ttfts:
+        logger.info(f"  Mean time to first token: {sum(ttfts) / len(ttfts):.3f}s")
+    if rates:
+        logger.info(f"  Mean tokens/sec: {sum(rates) / len(rates):.1f}")
+
+
+def send_prompt_to_ollama(prompt_text, client=None):
     """Send the prompt to Ollama model and display the response."""
-    client = OllamaClient(model_name="codellama:latest")
+    if client is None:
+        client = create_backend("ollama")
     result = client.generate(prompt_text)
     print_prompt_and_response(result, prompt_text=prompt_text)
     return result
@@ -190,18 +629,159 @@ def send_prompt_to_ollama(prompt_text):
 
 def main():
     parser = argparse.ArgumentParser(description="Code Test Prompt Generator")
-    parser.add_argument("repo", help="GitHub repo URL to analyze")
+    parser.add_argument("repo", nargs="?", help="GitHub repo URL to analyze")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="File with one repo URL or local path per line; stages are pipelined across repos")
+    parser.add_argument("--report", default="batch_report.json", help="Where --batch writes its JSON report")
     parser.add_argument("--test", choices=["unit", "integration", "fuzz", "mutation", "property"], default="unit",
                         help="Choose type of tests to generate")
+    parser.add_argument("--backend", choices=BACKENDS, default="ollama",
+                        help="LLM backend; 'fake' answers offline from recorded or templated responses")
+    parser.add_argument("--model", help=f"Model name (default: {DEFAULT_MODEL} for ollama)")
+    parser.add_argument("--ollama-url", default="http://localhost:11434", help="Base URL of the Ollama server")
+    parser.add_argument("--record-responses", metavar="FILE",
+                        help="Append every prompt and LLM response to this JSONL file (replayable with --backend fake)")
+    parser.add_argument("--fake-replay", metavar="FILE", help="Responses recorded with --record-responses to replay")
+    parser.add_argument("--fake-ttft", type=float, default=0.0,
+                        help="Simulated time to first token of the fake backend, in seconds")
+    parser.add_argument("--fake-tokens-per-sec", type=float,
+                        help="Simulated decode speed of the fake backend (default: instant)")
+    parser.add_argument("--fake-jitter", type=float, default=0.0,
+                        help="Vary the fake backend's latency by up to this fraction, deterministically per prompt")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of LLM requests in flight at once")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Empty the LLM response cache before running")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Location of the LLM response cache")
+    parser.add_argument("--cache-size-mb", type=int, default=512, help="Maximum size of the LLM response cache")
+    parser.add_argument("--analysis-cache", default=DEFAULT_ANALYSIS_CACHE_PATH,
+                        help="Where parsed sources and docs are cached by content hash between runs")
+    parser.add_argument("--no-analysis-cache", action="store_true",
+                        help="Parse every source and doc file again instead of using the analysis cache")
+    parser.add_argument("--incremental", metavar="STATE_DIR",
+                        help="Keep the clone and a manifest in STATE_DIR and only regenerate changed functions")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream LLM responses and stop each one once a complete code block has arrived")
+    parser.add_argument("--coverage-guided", action="store_true",
+                        help="Measure baseline coverage and generate tests for the least-covered functions first")
+    parser.add_argument("--token-budget", type=int, help="Approximate LLM token budget for --coverage-guided")
+    parser.add_argument("--time-budget", type=float, help="Wall-clock budget in seconds for --coverage-guided")
+    parser.add_argument("--in-process-coverage", action="store_true",
+                        help="Measure coverage with the coverage API in this process instead of subprocesses")
+    parser.add_argument("--validate", action="store_true",
+                        help="Run each generated test file in a sandboxed process and keep only passing ones")
+    parser.add_argument("--test-timeout", type=float, default=60, help="Per-test-file timeout in seconds for --validate")
+    parser.add_argument("--test-memory-mb", type=int, default=1024, help="Per-test-file memory limit for --validate")
+    parser.add_argument("--repair-attempts", type=int, default=0,
+                        help="Send failing tests back to the LLM with their error up to N times (implies --validate)")
+    parser.add_argument("--repair-token-budget", type=int, default=4000,
+                        help="Approximate token budget for repairing the tests of one function")
+    parser.add_argument("--prompt-token-budget", type=int,
+                        help="Trim class context and docs so each prompt stays within about N tokens")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to parse source and documentation files")
+    parser.add_argument("--batch-prompts", action="store_true",
+                        help="Pack several small functions of one file into a single LLM call")
+    parser.add_argument("--batch-prompt-tokens", type=int, default=1500,
+                        help="Approximate token budget of the code in one batched prompt")
+    parser.add_argument("--batch-prompt-functions", type=int, default=8,
+                        help="Maximum number of functions in one batched prompt")
+    parser.add_argument("--fuzz-profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Hypothesis settings (max_examples, deadline) applied to every generated property test")
+    parser.add_argument("--fuzz-example-db", default=DEFAULT_EXAMPLE_DB,
+                        help="Hypothesis example database shared across runs, so failing examples are replayed")
+    parser.add_argument("--no-fuzz-example-db", action="store_true",
+                        help="Do not store or replay Hypothesis examples")
+    parser.add_argument("--fuzz-time-budget", type=float,
+                        help="Seconds of property tests per pytest run; later ones only replay stored examples")
+    parser.add_argument("--dedup-tests", action="store_true",
+                        help="Skip structurally duplicate tests and drop test files that add no coverage")
+    parser.add_argument("--clone-dir",
+                        help="Where working copies are created (default: $LLM_TEST_GEN_CLONE_DIR or the temp dir)")
+    parser.add_argument("--mirror-cache", nargs="?", const=DEFAULT_MIRROR_DIR, metavar="DIR",
+                        help=f"Keep bare mirrors in DIR (default {DEFAULT_MIRROR_DIR}) and update them with fetch")
+    parser.add_argument("--clone-depth", type=int, default=1, help="History depth of clones, 0 for full history")
+    parser.add_argument("--no-blob-filter", action="store_true", help="Download all blobs instead of a partial clone")
+    parser.add_argument("--sparse-checkout", action="store_true",
+                        help="Check out only Python, doc and config files (tests needing data files will fail)")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Write a JSON run report (stage times, tokens, latencies, cache hit rate, tests/min)")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write the same metrics in Prometheus text format (e.g. for a textfile collector)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Logging verbosity")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report import and init time of each pipeline stage")
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+    if not args.repo and not args.batch:
+        parser.error("either repo or --batch is required")
+
+    profile = StartupProfile(enabled=args.profile_startup)
+    profile.timings.append(("import main", _IMPORT_TIME))
+
+    cache = None
+    if not args.no_cache or args.clear_cache:
+        with profile.stage("init ResponseCache"):
+            cache = ResponseCache(args.cache_path, max_bytes=args.cache_size_mb * 1024 * 1024)
+        if args.clear_cache:
+            cache.clear()
+            logger.info(f"Cleared LLM response cache: {args.cache_path}")
+        if args.no_cache:
+            cache = None
+
+    backend_options = {"record_path": args.record_responses}
+    if args.model:
+        backend_options["model_name"] = args.model
+    if args.backend == "ollama":
+        backend_options["base_url"] = args.ollama_url
+    else:
+        backend_options.update(replay_path=args.fake_replay, ttft=args.fake_ttft,
+                               tokens_per_sec=args.fake_tokens_per_sec, jitter=args.fake_jitter)
+
+    options = dict(coverage_guided=args.coverage_guided, token_budget=args.token_budget,
+                   time_budget=args.time_budget, in_process_coverage=args.in_process_coverage,
+                   validate=args.validate, test_timeout=args.test_timeout, memory_limit_mb=args.test_memory_mb,
+                   repair_attempts=args.repair_attempts, repair_token_budget=args.repair_token_budget,
+                   prompt_token_budget=args.prompt_token_budget, workers=args.workers, dedup=args.dedup_tests,
+                   backend=args.backend, backend_options=backend_options,
+                   analysis_cache=None if args.no_analysis_cache else AnalysisCache(args.analysis_cache),
+                   fuzz_settings=FuzzSettings(args.fuzz_profile,
+                                              None if args.no_fuzz_example_db else args.fuzz_example_db,
+                                              args.fuzz_time_budget),
+                   clone_manager=CloneManager(base_dir=args.clone_dir, mirror_dir=args.mirror_cache,
+                                              depth=args.clone_depth, filter_blobs=not args.no_blob_filter,
+                                              sparse=args.sparse_checkout),
+                   batcher=PromptBatcher(token_budget=args.batch_prompt_tokens,
+                                         max_functions=args.batch_prompt_functions) if args.batch_prompts else None)
+    if args.batch:
+        from batch import read_repo_list
+        repos = read_repo_list(args.batch)
+        logger.info(f"Batch of {len(repos)} repositories, test type: {args.test}")
+        run_batch(repos, args.report, cache=cache, concurrency=args.concurrency, stream=args.stream,
+                  state_dir=args.incremental, profile=profile, test_type=args.test, **options)
+        profile.report()
+        write_metrics(args)
+        return
+
+    logger.info(f"\nCloning and analyzing repository: {args.repo}")
+    logger.info(f"Test type selected: {args.test}")
+    analyze_github_repo(args.repo, args.test, concurrency=args.concurrency, cache=cache,
+                        state_dir=args.incremental, stream=args.stream, profile=profile, **options)
+    profile.report()
+    write_metrics(args)
+
+
+def write_metrics(args):
+    if args.metrics_json:
+        METRICS.write_json(args.metrics_json)
+        logger.info(f"Run report written to {args.metrics_json}")
+    if args.metrics_prom:
+        METRICS.write_prometheus(args.metrics_prom)
+        logger.info(f"Prometheus metrics written to {args.metrics_prom}")
 
-    print(f"\nCloning and analyzing repository: {args.repo}")
-    print(f"Test type selected: {args.test}")
-    analyze_github_repo(args.repo, args.test)
 
+_IMPORT_TIME = time.perf_counter() - _IMPORT_START
 
 if __name__ == "__main__":
-    # main()
-    test_repo = "https://github.com/proatik/sorting-algorithms.git"
-    #analyze_github_repo(test_repo)
-    analyze_github_repo(test_repo,test_type = 'fuzz')
+    main()
@@ -0,0 +1,169 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; LLM calls range from cache-warm sub-second replies to minutes on a cold model
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+PROMETHEUS_PREFIX = "llm_testgen"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with the cumulative layout Prometheus expects.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics:
+    """
+    Process-wide run metrics: wall time per pipeline stage, counters (tokens,
+    requests, cache hits, tests) and latency histograms.
+
+    Everything is thread-safe, since GenerationEngine, the validator and batch
+    mode all record from worker threads. Exported as a JSON run report and as a
+    Prometheus text file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._start = time.perf_counter()
+            self.stages = {}  # name -> {"seconds": total, "count": n}
+            self.counters = {}
+            self.histograms = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Add the wall time of the block to stage `name`. Stages may nest and may
+        run concurrently (batch mode), so their sum can exceed the elapsed time.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+                stage["seconds"] += seconds
+                stage["count"] += 1
+
+    def _ratio(self, numerator, denominator):
+        denominator = self.counters.get(denominator, 0) if isinstance(denominator, str) else denominator
+        return round(self.counters.get(numerator, 0) / denominator, 3) if denominator else None
+
+    def report(self):
+        elapsed = time.perf_counter() - self._start
+        with self._lock:
+            lookups = self.counters.get("cache_hits", 0) + self.counters.get("cache_misses", 0)
+            derived = {
+                "cache_hit_rate": self._ratio("cache_hits", lookups),
+                "tests_accepted_per_minute": self._ratio("tests_accepted", elapsed / 60),
+                # Backends report prefill (prompt eval) and decode (eval) time separately
+                "prefill_tokens_per_sec": self._ratio("llm_prompt_tokens", "llm_prompt_eval_seconds"),
+                "decode_tokens_per_sec": self._ratio("llm_completion_tokens", "llm_eval_seconds"),
+            }
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "elapsed_seconds": round(elapsed, 3),
+                "stages": {name: {"seconds": round(s["seconds"], 3), "count": s["count"]}
+                           for name, s in self.stages.items()},
+                "counters": {name: round(value, 6) if isinstance(value, float) else value
+                             for name, value in sorted(self.counters.items())},
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+                "derived": derived,
+            }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format, e.g. for node_exporter's textfile collector.
+        """
+        report = self.report()
+        lines = [f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds_total counter"]
+        for name, stage in report["stages"].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_total{{stage="{name}"}} {stage["seconds"]}')
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name}_total counter")
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}_total {value}")
+        with self._lock:
+            histograms = list(self.histograms.items())
+        for name, histogram in histograms:
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'{metric}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{metric}_sum {round(histogram.sum, 6)}")
+            lines.append(f"{metric}_count {histogram.count}")
+        for name, value in report["derived"].items():
+            if value is not None:
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+                lines.append(f"{PROMETHEUS_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+METRICS = Metrics()
+
+
+def timed(name):
+    """
+    Decorator recording every call of the function as stage `name` in METRICS.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
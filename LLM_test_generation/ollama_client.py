@@ -1,29 +1,95 @@
-# ollama_client.py
+import json
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from code_rewriter import CODE_BLOCK_PATTERN
+from llm_backend import DEFAULT_MODEL, LLMBackend
 
 
-class OllamaClient:
-    def __init__(self, base_url="http://localhost:11434", model_name="codellama:latest"):
+class OllamaClient(LLMBackend):
+    # A malformed NDJSON line of a stream fails the request like a connection error would
+    errors = (requests.exceptions.RequestException, json.JSONDecodeError)
+
+    def __init__(self, base_url="http://localhost:11434", model_name=DEFAULT_MODEL, pool_size=10, cache=None,
+                 stream=False, record_path=None):
+        super().__init__(model_name=model_name, cache=cache, stream=stream, record_path=record_path)
         self.base_url = base_url
-        self.model_name = model_name
+        # One keep-alive session shared by every request (and every thread) of this client
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-    def generate(self, prompt, temperature=0.2, max_tokens=None):
+    def _payload(self, prompt, temperature, max_tokens, stream):
         payload = {
             "model": self.model_name,
             "prompt": prompt,
             "temperature": temperature,
-            "stream": False,
+            "stream": stream,
             "keep_alive": "1m"
         }
         if max_tokens:
             payload["num_predict"] = max_tokens
+        return payload
+
+    def _record_usage(self, result):
+        # Ollama reports durations in nanoseconds
+        self.record_usage(result.get("prompt_eval_count", 0), result.get("eval_count", 0),
+                          prompt_seconds=result.get("prompt_eval_duration", 0) / 1e9,
+                          eval_seconds=result.get("eval_duration", 0) / 1e9,
+                          load_seconds=result.get("load_duration", 0) / 1e9)
 
+    def _generate(self, prompt, temperature, max_tokens):
+        payload = self._payload(prompt, temperature, max_tokens, stream=False)
+        response = self.session.post(f"{self.base_url}/api/generate", json=payload)
+        response.raise_for_status()
+        result = response.json()
+        self._record_usage(result)
+        return result.get("response", "")
+
+    def generate_stream(self, prompt, temperature=0.2, max_tokens=None, stop_at_code_block=True):
+        """
+        Yield response tokens as they arrive from Ollama's NDJSON stream.
+
+        With stop_at_code_block the request is cancelled as soon as a complete
+        fenced code block has been received; whatever the model would write after
+        the closing fence is never generated. Timing of every call is appended to
+        self.stream_stats (time to first token, tokens/sec, whether it was cut off).
+        """
+        payload = self._payload(prompt, temperature, max_tokens, stream=True)
+        stats = {"ttft": None, "tokens": 0, "tokens_per_sec": None, "stopped_early": False}
+        text = []
+        start = time.perf_counter()
+        first_token_at = None
+
+        response = self.session.post(f"{self.base_url}/api/generate", json=payload, stream=True)
         try:
-            response = requests.post(f"{self.base_url}/api/generate", json=payload)
             response.raise_for_status()
-            result = response.json()
-            return result.get("response", "").strip()
-        except requests.exceptions.RequestException as e:
-            print(f"Error communicating with Ollama: {e}")
-            return None
-
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                token = chunk.get("response", "")
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        stats["ttft"] = round(first_token_at - start, 3)
+                    stats["tokens"] += 1
+                    text.append(token)
+                    yield token
+                    # Only a token with a backtick can close a fence, so skip the search otherwise
+                    if stop_at_code_block and "`" in token and CODE_BLOCK_PATTERN.search("".join(text)):
+                        stats["stopped_early"] = not chunk.get("done", False)
+                        break
+                if chunk.get("done"):
+                    self._record_usage(chunk)
+                    break
+        finally:
+            # Closing the connection makes Ollama abort the rest of the generation
+            response.close()
+            if stats["stopped_early"]:
+                # The final chunk with Ollama's counts never arrives; count the streamed tokens apart
+                self.record_stopped_stream(stats["tokens"])
+            self._finish_stream(stats, first_token_at)
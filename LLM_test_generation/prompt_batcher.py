@@ -0,0 +1,164 @@
+import re
+
+from code_analyzer import find_symbol
+from code_rewriter import CODE_BLOCK_PATTERN
+from context_builder import estimate_tokens
+
+DELIMITER = "### TESTS FOR:"
+DELIMITER_PATTERN = re.compile(r"^[ \t#*`]*TESTS FOR:\s*`?([\w.]+)`?", re.MULTILINE)
+
+TEST_KINDS = {
+    "unit": "unit tests using pytest that cover edge cases and important behaviors",
+    "fuzz": "fuzz tests using Hypothesis for diverse inputs, compatible with pytest and with assert statements",
+    "mutation": "mutation-robust tests ensuring key logic correctness",
+    "property": "property-based tests describing invariants",
+}
+
+
+def split_response(response, function_names):
+    """
+    Split a batched response into {function name: text with its code block}.
+
+    Sections start at a "### TESTS FOR: name" line. Without any delimiters, code
+    blocks are assigned in order if there is exactly one per function. Functions
+    with no section are left out so the caller can retry them on their own.
+    """
+    if not response:
+        return {}
+    wanted = set(function_names)
+    markers = [m for m in DELIMITER_PATTERN.finditer(response) if m.group(1) in wanted]
+    if not markers:
+        blocks = CODE_BLOCK_PATTERN.findall(response)
+        if len(blocks) == len(function_names):
+            return {name: f"```python\n{block.strip()}\n```" for name, block in zip(function_names, blocks)}
+        return {}
+
+    sections = {}
+    for marker, following in zip(markers, markers[1:] + [None]):
+        text = response[marker.end():following.start() if following else len(response)]
+        if "```" in text and marker.group(1) not in sections:
+            sections[marker.group(1)] = text.strip()
+    return sections
+
+
+class PromptBatcher:
+    """
+    Packs the prompts of several small functions of one file into a single LLM call.
+
+    Only plain module-level functions whose source fits small_function_tokens are packed,
+    at most max_functions per call and within token_budget; methods and larger
+    functions keep their own prompt. The model is asked for one delimited section
+    per function and the response is split back, so callers still see one
+    response per original prompt.
+    """
+
+    def __init__(self, token_budget=1500, small_function_tokens=300, max_functions=8):
+        self.token_budget = token_budget
+        self.small_function_tokens = small_function_tokens
+        self.max_functions = max_functions
+        self.stats = {"functions": 0, "calls": 0, "prompt_tokens_unbatched": 0, "prompt_tokens": 0,
+                      "response_tokens": 0, "answered": 0, "retried": 0}
+
+    def _section(self, p, symbol):
+        docs = f"\nDocumentation:\n{p['docs']}\n" if p.get("docs") else ""
+        return f"## Function: {p['function']}\n\n{symbol['source']}\n{docs}"
+
+    def _batched_prompt(self, file_path, imports, sections, names, test_type):
+        import_info = f"# Imports:\n{chr(10).join(imports)}\n\n" if imports else ""
+        return f"""
+# File: {file_path}
+{import_info}
+{chr(10).join(sections)}
+Write {TEST_KINDS.get(test_type, TEST_KINDS['unit'])} for each of these {len(names)} functions: {', '.join(names)}.
+For every function, start its section with a line `{DELIMITER} <function name>` followed by
+one self-contained ```python code block with its tests (including imports). Do not merge sections.
+"""
+
+    def pack(self, prompts, code_results, test_type="unit"):
+        """
+        Return (calls, members): the prompts to send and, for each of them, the
+        indices of the original prompts it answers.
+        """
+        calls, members = [], []
+        groups = {}  # file -> (names, sections, indices, tokens)
+
+        def flush(file_path):
+            names, sections, indices, _ = groups.pop(file_path)
+            if len(indices) == 1:
+                calls.append(prompts[indices[0]]["prompt"])
+            else:
+                imports = code_results.get(file_path, {}).get("imports", [])
+                calls.append(self._batched_prompt(file_path, imports, sections, names, test_type))
+                self.stats["functions"] += len(indices)
+            members.append(indices)
+
+        for i, p in enumerate(prompts):
+            data = code_results.get(p["file"], {})
+            symbol = find_symbol(data, p["function"]) if "symbols" in data else None
+            # Methods, nested and async functions need their own prompt (class context, notes)
+            batchable = symbol and not (symbol["class"] or symbol.get("enclosing") or symbol.get("async"))
+            section = self._section(p, symbol) if batchable else None
+            if section is None or estimate_tokens(symbol["source"]) > self.small_function_tokens:
+                calls.append(p["prompt"])
+                members.append([i])
+                continue
+
+            cost = estimate_tokens(section)
+            group = groups.get(p["file"])
+            if group and (len(group[2]) >= self.max_functions or group[3] + cost > self.token_budget):
+                flush(p["file"])
+                group = None
+            if group is None:
+                group = groups[p["file"]] = ([], [], [], 0)
+            names, sections, indices, tokens = group
+            names.append(p["function"])
+            sections.append(section)
+            indices.append(i)
+            groups[p["file"]] = (names, sections, indices, tokens + cost)
+
+        for file_path in list(groups):
+            flush(file_path)
+        return calls, members
+
+    def generate_all(self, engine, prompts, code_results, test_type="unit", temperature=0.2, max_tokens=None):
+        """
+        Drop-in for engine.generate_all over per-function prompts: returns one
+        response per prompt, in input order, using batched calls where possible.
+        """
+        calls, members = self.pack(prompts, code_results, test_type)
+        self.stats["calls"] += len(calls)
+        self.stats["prompt_tokens_unbatched"] += sum(estimate_tokens(p["prompt"]) for p in prompts)
+        self.stats["prompt_tokens"] += sum(estimate_tokens(call) for call in calls)
+
+        responses = [None] * len(prompts)
+        retry = []
+        for indices, response in zip(members, engine.generate_all(calls, temperature, max_tokens)):
+            self.stats["response_tokens"] += estimate_tokens(response or "")
+            if len(indices) == 1:
+                responses[indices[0]] = response
+                continue
+            parts = split_response(response, [prompts[i]["function"] for i in indices])
+            for i in indices:
+                if prompts[i]["function"] in parts:
+                    responses[i] = parts[prompts[i]["function"]]
+                else:
+                    retry.append(i)
+
+        # Functions the model skipped or merged get their own prompt
+        if retry:
+            self.stats["retried"] += len(retry)
+            self.stats["calls"] += len(retry)
+            self.stats["prompt_tokens"] += sum(estimate_tokens(prompts[i]["prompt"]) for i in retry)
+            for i, response in zip(retry, engine.generate_all((prompts[i]["prompt"] for i in retry),
+                                                              temperature, max_tokens)):
+                self.stats["response_tokens"] += estimate_tokens(response or "")
+                responses[i] = response
+
+        self.stats["answered"] += sum(1 for response in responses if response)
+        return responses
+
+    def report(self):
+        stats = dict(self.stats)
+        tokens = stats["prompt_tokens"] + stats["response_tokens"]
+        stats["tokens_per_answer"] = round(tokens / stats["answered"], 1) if stats["answered"] else None
+        return stats
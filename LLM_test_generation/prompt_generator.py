@@ -1,25 +1,39 @@
+import logging
 import os
 import ast
 
+from code_analyzer import build_symbol_index, find_symbol, symbol_notes
+from context_builder import ClassContextBuilder, estimate_tokens
+from doc_index import DocIndex
+
+logger = logging.getLogger(__name__)
+
 
 class PromptGenerator:
-    def __init__(self, extract_function_code_func):
+    def __init__(self, extract_function_code_func, token_budget=None):
         self.extract_function_code = extract_function_code_func
+        # With a budget, class context is trimmed by ClassContextBuilder instead of embedded whole
+        self.context_builder = ClassContextBuilder(token_budget) if token_budget else None
+        self.token_stats = {"prompts": 0, "tokens_before": 0, "tokens_after": 0}
+
+    def _find_function_class(self, data, function_name):
+        """
+        Return the index entry of the class that directly defines function_name.
+        """
+        if "symbols" not in data:
+            try:
+                data = build_symbol_index(ast.parse(data.get("code", "")), data.get("code", ""))
+            except Exception as e:
+                logger.warning(f"AST parsing error while locating class for {function_name}: {e}")
+                return None
+
+        symbol = find_symbol(data, function_name)
+        if symbol and symbol["class"]:
+            return data["symbols"][symbol["class"]]  # Zwróć wpis klasy
+        return None
 
-    def _find_function_class(self, code, function_name):
-        try:
-            tree = ast.parse(code)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    for item in node.body:
-                        if isinstance(item, ast.FunctionDef) and item.name == function_name:
-                            return node  # Zwróć węzeł klasy
-            return None
-        except Exception as e:
-            print(f"AST parsing error while locating class for {function_name}: {e}")
-            return None
-
-    def _generate_prompt(self, file_path, imports, function_code, class_code, doc_snippet, function_name, test_type):
+    def _generate_prompt(self, file_path, imports, function_code, class_code, doc_snippet, function_name, test_type,
+                         notes=()):
         import_info = f"\n# Imports:\n{chr(10).join(imports)}\n" if imports else ""
         doc_info = f"\nDocumentation:\n{doc_snippet}\n" if doc_snippet else ""
 
@@ -46,28 +60,32 @@ class PromptGenerator:
                        f"correctness.")
         elif test_type == "property":
             prompt += f"\nWrite property-based tests for this function/method: {function_name} describing invariants."
+        for note in notes:
+            prompt += f"\n{note}"
 
         return prompt
 
-    def generate_batch_prompts(self, code_analysis_results, doc_data=None, test_type="unit"):
-        print(
-            f"\nNumber of functions detected during code analysis: {sum(len(v['functions']) for v in code_analysis_results.values())}")
+    def generate_batch_prompts(self, code_analysis_results, doc_data=None, test_type="unit", max_files=10,
+                               doc_index=None):
+        logger.info(
+            f"\nNumber of functions detected during code analysis: {sum(len(v.get('functions', [])) for v in code_analysis_results.values())}")
         prompts = []
+        if doc_index is None and doc_data:
+            doc_index = DocIndex(doc_data)
 
         for i, (file_path, data) in enumerate(code_analysis_results.items()):
-            if i >= 10:
+            if max_files is not None and i >= max_files:
                 break
-            source_code = data.get("code", "")
             imports = data.get("imports", [])
 
             for function_name in data.get("functions", []):
-                function_code = self.extract_function_code(source_code, function_name)
-                related_docs = self._find_related_docs(file_path, doc_data, function_name)
+                function_code = self.extract_function_code(data, function_name)
+                # Docs mention methods by their own name, not Class.method
+                related_docs = self._find_related_docs(file_path, doc_index, function_name.rsplit(".", 1)[-1])
+                notes = symbol_notes(find_symbol(data, function_name)) if "symbols" in data else []
 
-                class_node = self._find_function_class(source_code, function_name)
-                class_code = None
-                if class_node:
-                    class_code = ast.get_source_segment(source_code, class_node)
+                class_symbol = self._find_function_class(data, function_name)
+                class_code = class_symbol["source"] if class_symbol else None
 
                 prompt = self._generate_prompt(
                     file_path=file_path,
@@ -76,66 +94,47 @@ class PromptGenerator:
                     class_code=class_code,
                     doc_snippet=related_docs,
                     function_name=function_name,
-                    test_type=test_type
+                    test_type=test_type,
+                    notes=notes
                 )
+                self.token_stats["prompts"] += 1
+                self.token_stats["tokens_before"] += estimate_tokens(prompt)
+
+                if self.context_builder is not None and "symbols" in data:
+                    code_context, doc_snippet = self.context_builder.build(data, function_name, related_docs)
+                    prompt = self._generate_prompt(
+                        file_path=file_path,
+                        imports=imports,
+                        function_code=code_context or f"# Function {function_name} code not found",
+                        class_code=None,
+                        doc_snippet=doc_snippet,
+                        function_name=function_name,
+                        test_type=test_type,
+                        notes=notes
+                    )
+                else:
+                    doc_snippet = related_docs
+                self.token_stats["tokens_after"] += estimate_tokens(prompt)
 
                 prompts.append({
                     "file": file_path,
                     "function": function_name,
-                    "prompt": prompt
+                    "prompt": prompt,
+                    "docs": doc_snippet
                 })
 
+        if self.context_builder is not None:
+            before, after = self.token_stats["tokens_before"], self.token_stats["tokens_after"]
+            saved = 100 * (before - after) / before if before else 0
+            logger.info(f"Prompt tokens (estimated): {before} with whole classes, {after} trimmed ({saved:.1f}% saved)")
         return prompts
 
-    def _find_related_docs(self, file_path, doc_data, function_name=None):
-        if not doc_data or not function_name:
+    def _find_related_docs(self, file_path, doc_index, function_name=None, top_k=1):
+        if not doc_index or not function_name:
             return None
 
-        target_function = function_name.lower()
-
-        # Szukaj dopasowań, ale filtruj zbyt ogólne dokumenty jak "Changelog" czy "Performance"
-        def is_valid_section(title):
-            forbidden = ["changelog", "performance", "installation", "license", "contributing"]
-            return not any(word in title.lower() for word in forbidden)
-
-        best_match = None
-        best_score = 0
-
-        for doc_path, doc_info in doc_data.items():
-            sections = doc_info.get("sections", {})
-
-            for heading, content in sections.items():
-                heading_lower = heading.lower()
-                content_lower = content.lower()
-
-                # Ignoruj bezużyteczne sekcje
-                if not is_valid_section(heading):
-                    continue
-
-                score = 0
-
-                # Dopasowanie nazwy funkcji w headingu
-                if target_function == heading_lower:
-                    score += 20
-
-                # Funkcja wspomniana w treści
-                if target_function in content_lower:
-                    score += 10
-
-                # Słowa kluczowe z funkcji
-                keywords = target_function.split('_')
-                score += sum(1 for k in keywords if k in heading_lower or k in content_lower)
-
-                if score > best_score:
-                    best_score = score
-                    best_match = (heading, content)
-
-        if best_match and best_score >= 15:  # <- tylko jeśli naprawdę wysokie trafienie
-            heading, content = best_match
-            return f"### {heading}\n{content[:1000]}"
-
-        # Jeśli nie ma sensownego dopasowania
-        return None
-
-
-
+        matches = doc_index.query(function_name, top_k=top_k)
+        if not matches:
+            # Jeśli nie ma sensownego dopasowania
+            return None
+        return "\n\n".join(f"### {heading}\n{content[:1000]}" for heading, content, _ in matches)
@@ -0,0 +1,188 @@
+import ast
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from context_builder import estimate_tokens
+from validation import PASS
+
+logger = logging.getLogger(__name__)
+
+SYNTAX_ERROR_MARKER = "# Syntax error in generated code\n"
+
+
+def has_syntax_error_marker(test_path):
+    """
+    Whether a test file was saved with SYNTAX_ERROR_MARKER, i.e. cannot even be collected.
+    """
+    with open(test_path, "r", encoding="utf-8") as f:
+        return f.read(len(SYNTAX_ERROR_MARKER)) == SYNTAX_ERROR_MARKER
+
+
+def compact_error(output, max_chars=1500):
+    """
+    Keep only the informative part of pytest output: error lines, exception
+    lines and the final summary.
+    """
+    lines = output.splitlines()
+    keep = [l for l in lines if l.startswith("E ") or "Error" in l or "error" in l]
+    if lines:
+        keep.append(lines[-1])
+    text = "\n".join(dict.fromkeys(keep)) or output
+    return text[-max_chars:]
+
+
+class TestRepairer:
+    """
+    Sends broken generated tests back to the LLM together with their error
+    (SyntaxError, ImportError or pytest failure) for a bounded number of retries.
+
+    Drop-in for TestValidator.accepted: tests are validated first and only the
+    failing ones are repaired. Outcomes are counted per attempt (attempt 0 is
+    the original generation) so the usefulness of every retry can be measured.
+    """
+
+    def __init__(self, llm_client, validator, postprocess, max_attempts=2, token_budget=4000):
+        self.llm_client = llm_client
+        self.validator = validator
+        self.postprocess = postprocess
+        self.max_attempts = max_attempts
+        self.token_budget = token_budget
+        self.sources = {}
+        self.tokens_by_function = Counter()
+        self.tried = Counter()
+        self.succeeded = Counter()
+        self._lock = threading.Lock()
+
+    def track(self, test_paths, p):
+        """
+        Remember which prompt (file/function) each written test file came from.
+        """
+        for test_path in test_paths:
+            self.sources[test_path] = p
+
+    def _record(self, attempt, success):
+        with self._lock:
+            self.tried[attempt] += 1
+            if success:
+                self.succeeded[attempt] += 1
+
+    @staticmethod
+    def _read(test_path):
+        with open(test_path, "r", encoding="utf-8") as f:
+            code = f.read()
+        return code[len(SYNTAX_ERROR_MARKER):] if code.startswith(SYNTAX_ERROR_MARKER) else code
+
+    def _syntax_error(self, test_path):
+        try:
+            ast.parse(self._read(test_path))
+        except SyntaxError as e:
+            return f"SyntaxError: {e.msg} (line {e.lineno}): {(e.text or '').strip()}"
+        return None
+
+    def _describe(self, test_path, result):
+        return self._syntax_error(test_path) or f"{result['status']}:\n{compact_error(result['output'])}"
+
+    def check(self, test_path):
+        """
+        Return None if the test file passes, otherwise a compact error description.
+        """
+        error = self._syntax_error(test_path)
+        if error:
+            return error
+        result = self.validator.run_test_file(test_path)
+        return None if result["status"] == PASS else self._describe(test_path, result)
+
+    def _repair_prompt(self, p, code, error):
+        return f"""
+# File: {p['file']}
+# Function: {p['function']}
+
+This pytest test file for `{p['function']}` does not work.
+
+# Error:
+{error}
+
+# Previous attempt:
+```python
+{code}
+```
+
+Fix the error and return the complete corrected test file in a single ```python code block.
+"""
+
+    def repair_file(self, test_path, error):
+        """
+        Retry a failing test up to max_attempts times within the per-function token budget.
+        Returns True once the file passes.
+        """
+        p = self.sources.get(test_path)
+        if p is None:
+            return False
+
+        # Fuzz responses are split into several files, so the budget is shared per function
+        function_key = (p["file"], p["function"])
+        for attempt in range(1, self.max_attempts + 1):
+            prompt = self._repair_prompt(p, self._read(test_path), error)
+            with self._lock:
+                if self.tokens_by_function[function_key] + estimate_tokens(prompt) > self.token_budget:
+                    break
+                self.tokens_by_function[function_key] += estimate_tokens(prompt)
+            response = self.llm_client.generate(prompt)
+            with self._lock:
+                self.tokens_by_function[function_key] += estimate_tokens(response)
+            if not response:
+                self._record(attempt, False)
+                continue
+
+            with open(test_path, "w", encoding="utf-8") as f:
+                f.write(self.postprocess(response, p))
+            error = self.check(test_path)
+            self._record(attempt, error is None)
+            if error is None:
+                logger.info(f"[+] Repaired {os.path.basename(test_path)} on attempt {attempt}")
+                return True
+        return False
+
+    def accepted(self, test_paths):
+        """
+        Validate test_paths, repair the failing ones, move the still-failing ones
+        away and return the passing ones.
+        """
+        test_paths = list(test_paths)
+        results = self.validator.validate(test_paths)
+        failing = []
+        for test_path in test_paths:
+            passed = results[test_path]["status"] == PASS
+            self._record(0, passed)
+            if not passed:
+                failing.append((test_path, self._describe(test_path, results[test_path])))
+
+        repaired = set()
+        if failing and self.max_attempts > 0:
+            with ThreadPoolExecutor(max_workers=min(self.validator.workers, len(failing))) as pool:
+                outcomes = pool.map(lambda item: self.repair_file(*item), failing)
+                repaired = {test_path for (test_path, _), ok in zip(failing, outcomes) if ok}
+
+        passing = []
+        for test_path in test_paths:
+            if results[test_path]["status"] == PASS or test_path in repaired:
+                passing.append(test_path)
+            else:
+                self.validator.reject(test_path)
+        return passing
+
+    def report(self):
+        """
+        Success rate per attempt, e.g. {0: {"tried": 10, "succeeded": 4, "rate": 0.4}, 1: ...}.
+        """
+        return {
+            attempt: {
+                "tried": self.tried[attempt],
+                "succeeded": self.succeeded[attempt],
+                "rate": round(self.succeeded[attempt] / self.tried[attempt], 3)
+            }
+            for attempt in sorted(self.tried)
+        }
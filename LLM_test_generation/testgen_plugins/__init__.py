@@ -0,0 +1,7 @@
+import os
+
+# pytest plugins for the test runs of the repository under test. Only this directory
+# goes on the PYTHONPATH of those runs, so the plugins are importable there by their
+# module names without putting the rest of the tool ahead of the repository's own
+# modules and installed dependencies.
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
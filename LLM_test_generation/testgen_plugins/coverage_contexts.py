@@ -0,0 +1,18 @@
+import os
+
+import coverage
+import pytest
+
+
+# pytest plugin module, loaded with "-p coverage_contexts" under "coverage run" and passed
+# as a plugin to in-process runs. It imports nothing of this project, so it works with
+# only the plugin directory on the path.
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """
+    Switch the coverage context to the test file being run.
+    """
+    cov = coverage.Coverage.current()
+    if cov is not None:
+        cov.switch_context(os.path.abspath(str(item.path)))
@@ -0,0 +1,134 @@
+import json
+import os
+
+# Also a pytest plugin, loaded with "-p fuzz_profiles" by validation and coverage runs.
+# Like coverage_contexts it imports nothing of this project (and neither pytest nor
+# hypothesis at import time), so it cannot clash with the modules of the repository
+# under test and stays cheap to import for main.py.
+
+DEFAULT_EXAMPLE_DB = os.path.join(os.path.expanduser("~"), ".cache", "llm_test_generation", "hypothesis")
+
+# Budget of every generated property test; code_rewriter strips these keys from the
+# tests' own @settings, so the profile of the run always applies
+PROFILES = {
+    "quick": {"max_examples": 20, "deadline": 200},
+    "standard": {"max_examples": 100, "deadline": 1000},
+    "thorough": {"max_examples": 1000, "deadline": None},
+}
+DEFAULT_PROFILE = "standard"
+
+# Generated tests routinely trip these without being wrong (slow data generation,
+# fixtures shared between examples), so a health check must not fail them
+SUPPRESSED_HEALTH_CHECKS = ("too_slow", "filter_too_much", "data_too_large", "large_base_example",
+                            "function_scoped_fixture")
+
+
+class FuzzSettings:
+    """
+    Hypothesis budget of the generated tests: a settings profile, the example
+    database shared across runs and an optional cap on the total time spent in
+    property tests per pytest run.
+
+    Once the cap is spent, the remaining property tests only replay the examples
+    stored in the database (earlier failures among them) instead of generating
+    new ones.
+    """
+
+    def __init__(self, profile=DEFAULT_PROFILE, example_db=DEFAULT_EXAMPLE_DB, time_budget=None):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown fuzz profile {profile!r}, expected one of {sorted(PROFILES)}")
+        self.profile = profile
+        self.example_db = example_db
+        self.time_budget = time_budget
+
+    def pytest_args(self, timings_path=None):
+        """
+        Arguments that load this plugin and configure it for one pytest run. With
+        timings_path the time of every property test is appended there as JSON lines.
+        """
+        args = ["-p", "fuzz_profiles", "--fuzz-profile", self.profile]
+        if self.example_db:
+            args += ["--fuzz-example-db", self.example_db]
+        if self.time_budget is not None:
+            args += ["--fuzz-time-budget", str(self.time_budget)]
+        if timings_path:
+            args += ["--fuzz-timings", timings_path]
+        return args
+
+    @staticmethod
+    def read_timings(timings_path):
+        if not os.path.exists(timings_path):
+            return []
+        with open(timings_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+# --- pytest plugin ---
+
+_session = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("fuzz_profiles", "Hypothesis budget of generated tests")
+    group.addoption("--fuzz-profile", default=DEFAULT_PROFILE, choices=sorted(PROFILES),
+                    help="Settings profile applied to every property test")
+    group.addoption("--fuzz-example-db", help="Directory of the Hypothesis example database shared across runs")
+    group.addoption("--fuzz-time-budget", type=float,
+                    help="Seconds of property tests after which the rest only replay stored examples")
+    group.addoption("--fuzz-timings", help="Append the time of every property test to this JSON lines file")
+
+
+def pytest_configure(config):
+    _session.clear()
+    _session.update(properties={}, replay_only=set(), timings=[], spent=0.0,
+                    budget=config.getoption("fuzz_time_budget"), timings_path=config.getoption("fuzz_timings"))
+    try:
+        from hypothesis import HealthCheck, settings
+        from hypothesis.database import DirectoryBasedExampleDatabase
+    except ImportError:
+        return
+
+    name = config.getoption("fuzz_profile")
+    example_db = config.getoption("fuzz_example_db")
+    # Loaded before collection, so the settings of every test module imported afterwards derive from it
+    settings.register_profile(
+        f"llm_test_generation_{name}",
+        suppress_health_check=[getattr(HealthCheck, check) for check in SUPPRESSED_HEALTH_CHECKS
+                               if hasattr(HealthCheck, check)],
+        database=DirectoryBasedExampleDatabase(example_db) if example_db else None,
+        **PROFILES[name])
+    settings.load_profile(f"llm_test_generation_{name}")
+
+
+def pytest_runtest_setup(item):
+    test = getattr(getattr(item, "obj", None), "__func__", getattr(item, "obj", None))
+    if not getattr(test, "is_hypothesis_test", False):
+        return
+    _session["properties"][item.nodeid] = os.path.abspath(str(item.path))
+
+    budget = _session["budget"]
+    current = getattr(test, "_hypothesis_internal_use_settings", None)
+    if budget is not None and _session["spent"] >= budget and current is not None:
+        from hypothesis import Phase, settings
+        test._hypothesis_internal_use_settings = settings(current, phases=[Phase.explicit, Phase.reuse])
+        _session["replay_only"].add(item.nodeid)
+
+
+def pytest_runtest_logreport(report):
+    if report.when != "call" or report.nodeid not in _session.get("properties", {}):
+        return
+    _session["spent"] += report.duration
+    _session["timings"].append({
+        "test": report.nodeid,
+        "file": _session["properties"][report.nodeid],
+        "seconds": round(report.duration, 4),
+        "outcome": report.outcome,
+        "replay_only": report.nodeid in _session["replay_only"],
+    })
+
+
+def pytest_sessionfinish(session):
+    if _session.get("timings_path") and _session["timings"]:
+        # One write per run: parallel validation processes may append to the same file
+        with open(_session["timings_path"], "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(timing) + "\n" for timing in _session["timings"]))
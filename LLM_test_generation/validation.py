@@ -0,0 +1,132 @@
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from testgen_plugins import PLUGIN_DIR
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the timeout still applies
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PASS = "pass"
+FAIL = "fail"
+ERROR = "error"
+TIMEOUT = "timeout"
+
+# pytest exit codes: 0 all passed, 1 some failed, 2 interrupted (e.g. collection/import
+# error), 3 internal error, 4 usage error, 5 no tests collected
+_EXIT_STATUS = {0: PASS, 1: FAIL}
+
+# Sets the memory limit inside the child and then execs pytest, which keeps the limit.
+# preexec_fn would do it between fork and exec, which is unsafe with the validation threads.
+_LIMITED_PYTEST = ("import os, resource, sys; limit = int(sys.argv[1]); "
+                   "resource.setrlimit(resource.RLIMIT_AS, (limit, limit)); "
+                   "os.execv(sys.executable, [sys.executable, '-m', 'pytest', *sys.argv[2:]])")
+
+
+class TestValidator:
+    """
+    Runs every generated test file in its own pytest process, CPU-count processes
+    at a time, with a per-file timeout and memory limit. pytest_args (e.g. the
+    FuzzSettings plugin arguments) are passed to every run.
+    """
+
+    def __init__(self, source_dir, timeout=60, memory_limit_mb=1024, workers=None, rejected_dir=None,
+                 pytest_args=None):
+        self.source_dir = source_dir
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.workers = workers or os.cpu_count() or 1
+        self.rejected_dir = rejected_dir or os.path.join(source_dir, "rejected_tests")
+        self.pytest_args = list(pytest_args or [])
+
+    def _pytest_command(self):
+        if resource is not None and self.memory_limit_mb:
+            return [sys.executable, "-c", _LIMITED_PYTEST, str(self.memory_limit_mb * 1024 * 1024)]
+        return [sys.executable, "-m", "pytest"]
+
+    def run_test_file(self, test_path):
+        """
+        Run one test file and classify it as pass, fail, error or timeout.
+        """
+        env = os.environ.copy()
+        paths = [self.source_dir] + ([PLUGIN_DIR] if self.pytest_args else []) + [env.get("PYTHONPATH", "")]
+        env["PYTHONPATH"] = os.pathsep.join(paths)
+        popen_kwargs = {}
+        if os.name == "posix":
+            popen_kwargs = {"start_new_session": True}
+
+        start = time.monotonic()
+        process = subprocess.Popen(
+            [*self._pytest_command(), "-q", "-p", "no:cacheprovider", *self.pytest_args, test_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            env=env,
+            **popen_kwargs
+        )
+        try:
+            output, _ = process.communicate(timeout=self.timeout)
+            status = _EXIT_STATUS.get(process.returncode, ERROR)
+        except subprocess.TimeoutExpired:
+            # Kill the whole session so a hung Hypothesis run cannot leave children behind
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            output, _ = process.communicate()
+            status = TIMEOUT
+
+        return {
+            "status": status,
+            "exit_code": process.returncode,
+            "duration": round(time.monotonic() - start, 3),
+            "output": output[-4000:]
+        }
+
+    def validate(self, test_paths):
+        """
+        Run all test files in parallel. Returns {test path: result} in input order.
+        """
+        test_paths = list(test_paths)
+        if not test_paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(test_paths))) as pool:
+            results = dict(zip(test_paths, pool.map(self.run_test_file, test_paths)))
+
+        counts = {}
+        for result in results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        logger.info(f"[+] Validated {len(results)} test files: {counts}")
+        return results
+
+    def reject(self, test_path):
+        """
+        Move a non-passing test out of the test directory so coverage never runs it.
+        """
+        os.makedirs(self.rejected_dir, exist_ok=True)
+        target = os.path.join(self.rejected_dir, os.path.basename(test_path))
+        shutil.move(test_path, target)
+        return target
+
+    def accepted(self, test_paths):
+        """
+        Validate test_paths, move the non-passing ones away and return the passing ones.
+        """
+        results = self.validate(test_paths)
+        passing = []
+        for test_path, result in results.items():
+            if result["status"] == PASS:
+                passing.append(test_path)
+            else:
+                logger.info(f" {os.path.basename(test_path)}: {result['status']}")
+                self.reject(test_path)
+        return passing